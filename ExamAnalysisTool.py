@@ -1,46 +1,780 @@
 # File: ExamAnalysisTool.py
 
+import time
+STARTUP_TIME = time.perf_counter()  # 用于 --profile-startup 统计启动耗时
+
 import os
+import sys
+import argparse
+import hashlib
+import json
+import importlib
+import functools
+import multiprocessing
 import threading
-import queue
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-import customtkinter as ctk
-import tkinter as tk
-from tkinter import messagebox, filedialog
-
-class FileHandler:
-    """文件处理"""
+import itertools
+import collections
+import cProfile
+import platform
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+class _LazyModule:
+    """第一次访问属性时才导入的模块，使图形界面不必等待 pandas、matplotlib 等加载完成"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+np = _LazyModule("numpy")
+pd = _LazyModule("pandas")
+matplotlib = _LazyModule("matplotlib")
+
+@functools.lru_cache(maxsize=None)
+def _optional_module(name):
+    """导入可选依赖，未安装时返回 None"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+def preload_modules():
+    """提前导入数据处理和绘图相关的库（可在后台线程中调用），返回耗时（秒）"""
+    start = time.perf_counter()
+    importlib.import_module("pandas")
+    importlib.import_module("matplotlib.figure")
+    importlib.import_module("matplotlib.backends.backend_agg")
+    importlib.import_module("matplotlib.backends.backend_pdf")
+    importlib.import_module("openpyxl")
+    _optional_module("pyarrow.feather")
+    _optional_module("xlsxwriter")
+    return time.perf_counter() - start
+
+# 列式磁盘缓存的存放目录
+CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".ExamAnalysisTool", "cache")
+# 每次任务的性能日志（JSON）和 cProfile 结果的存放目录
+LOG_DIRECTORY = os.path.join(os.path.expanduser("~"), ".ExamAnalysisTool", "logs")
+# 最多保留的性能日志数，超过时删除最早的
+LOG_MAX_FILES = 100
+# 性能日志中保留的 cProfile 函数数（按累计耗时排序）
+PROFILE_TOP_FUNCTIONS = 30
+# 任务运行期间采样内存的间隔（秒）
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+# 所有报表都必须包含的列
+REQUIRED_COLUMNS = ['考试编号', '姓名', '级名']
+# 按班级输出时使用的列（可选）
+CLASS_COLUMN = '班级'
+# 预检文件时除表头外只读取考试编号列
+PREFLIGHT_COLUMNS = ['考试编号']
+
+# 增量计算进退步系数时保存在输出目录中的状态文件
+PROGRESS_STATE_FILE = "进退步系数.state.json"
+# 增量生成折线图和成绩单时记录输出文件指纹的清单
+CHART_MANIFEST_FILE = "年级排名折线图.manifest.json"
+REPORT_MANIFEST_FILE = "成绩单.manifest.json"
+
+# 流式写入 Excel 时每批转换的行数
+EXCEL_WRITE_CHUNK_ROWS = 10000
+# 超过此大小的工作簿逐块读取，读取过程中可以取消
+LARGE_WORKBOOK_SIZE = 5 * 1024 * 1024
+# 逐块读取工作簿时每块的行数
+READ_CHUNK_ROWS = 5000
+
+# 折线图输出分辨率
+CHART_DPI = 300
+# 低分辨率预览模式使用的分辨率
+CHART_PREVIEW_DPI = 72
+# 并行生成折线图时每个任务包含的学生数
+CHART_CHUNK_SIZE = 20
+# 并行导出成绩单时每个任务包含的学生数
+REPORT_CHUNK_SIZE = 20
+
+# 同时运行的任务数，其余任务排队等待
+MAX_CONCURRENT_JOBS = 2
+
+# 两次进度消息之间的最短间隔（秒）
+PROGRESS_INTERVAL = 0.1
+# 消息类型对应的显示名称
+MESSAGE_LABELS = {"info": "信息", "warning": "警告", "error": "错误", "log": "日志"}
+# 任务各阶段的显示名称，各任务按实际耗时为阶段分配权重
+PHASE_LABELS = {"read": "读取文件", "validate": "校验数据", "merge": "合并数据", "compute": "计算", "write": "写出文件"}
+
+class OperationCanceled(Exception):
+    """读取文件的过程中操作被取消"""
+
+def _temp_path(path):
+    """写入 path 前使用的临时文件，按进程和线程区分，并发写入同一文件时互不干扰"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def _projection_key(columns):
+    """列投影在缓存中的键，None 表示所有列"""
+    return None if columns is None else tuple(sorted(str(col) for col in columns))
+
+def _project(df, columns):
+    """按文件中的顺序取出 columns 中存在的列"""
+    wanted = set(columns)
+    return df[[col for col in df.columns if col in wanted]]
+
+class DatasetCache:
+    """
+    已解析工作簿的内存缓存，按文件路径、修改时间和大小校验
+    同一文件可以同时缓存完整读取和只读取部分列（列投影）的结果，完整读取的结果也可以用于列投影
+    """
     def __init__(self):
-        self.filepaths = []
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(file):
+        """返回文件的 (修改时间, 大小)，用于判断缓存是否失效"""
+        stat = os.stat(file)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file, columns=None):
+        """命中缓存时返回 DataFrame 副本，否则返回 None；columns 为要读取的列，None 表示所有列"""
+        key = os.path.abspath(file)
+        projection = _projection_key(columns)
+        with self._lock:
+            entries = self._entries.get(key, {})
+            cached_projection = projection
+            if projection not in entries and projection is not None:
+                # 完整读取或包含所需列的投影也可以使用
+                cached_projection = next((candidate for candidate in entries
+                                          if candidate is None or set(projection) <= set(candidate)), projection)
+            entry = entries.get(cached_projection)
+        if entry is None:
+            return None
+        try:
+            signature = self.signature(file)
+        except OSError:
+            self.evict(file)
+            return None
+        if entry[0] != signature:
+            self.evict(file)
+            return None
+        df = entry[1]
+        if cached_projection != projection:
+            df = _project(df, columns)
+        return df.copy()
+
+    def put(self, file, signature, df, columns=None):
+        """缓存解析结果，文件已变化时丢弃旧的结果"""
+        key = os.path.abspath(file)
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries is None or any(entry[0] != signature for entry in entries.values()):
+                entries = self._entries[key] = {}
+            entries[_projection_key(columns)] = (signature, df)
+
+    def evict(self, file):
+        """移除文件对应的缓存"""
+        with self._lock:
+            self._entries.pop(os.path.abspath(file), None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+class ColumnarCache:
+    """Excel 文件的列式磁盘缓存（Feather 格式），按文件内容哈希失效"""
+    # 缓存格式变化时递增，使旧缓存自动失效
+    VERSION = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @property
+    def enabled(self):
+        # 未安装 pyarrow 时不启用磁盘缓存
+        return _optional_module("pyarrow.feather") is not None
+
+    @staticmethod
+    def content_hash(file):
+        """计算文件内容的 SHA-256"""
+        digest = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, digest, columns=None):
+        projection = _projection_key(columns)
+        if projection is not None:
+            digest += "-" + hashlib.sha256(json.dumps(projection, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.v{self.VERSION}.feather")
+
+    def load(self, digest, columns=None):
+        """
+        读取缓存（尽量使用内存映射），不存在或已损坏时返回 None
+        columns 不为 None 时读取相同列投影的缓存，没有则从完整读取的缓存中取出这些列
+        """
+        if not self.enabled:
+            return None
+        path = self._path(digest, columns)
+        if not os.path.exists(path) and columns is not None:
+            df = self.load(digest)
+            return _project(df, columns) if df is not None else None
+        if not os.path.exists(path):
+            return None
+        try:
+            return _optional_module("pyarrow.feather").read_table(path, memory_map=True).to_pandas()
+        except Exception:
+            # 缓存损坏时删除，下次重新生成
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def store(self, digest, df, columns=None):
+        """写入缓存，失败（如列名或列类型不被 Feather 支持）时静默跳过"""
+        if not self.enabled:
+            return
+        path = self._path(digest, columns)
+        temp_path = _temp_path(path)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _optional_module("pyarrow.feather").write_feather(df, temp_path)
+            os.replace(temp_path, path)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """删除所有缓存文件"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".feather"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+class MessageQueue:
+    """
+    后台任务向界面发送消息的线程安全通道，与 queue.Queue 的 put 接口兼容
+    进度和状态（当前阶段、剩余时间）只保留最新的值，其余消息按顺序排队，由界面线程批量取出
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._messages = collections.deque()
+        self._progress = None
+        self._status = None
+        self.has_error = False
+
+    def put(self, message):
+        with self._lock:
+            if message[0] == "error":
+                self.has_error = True
+            if message[0] == "progress":
+                self._progress = message[1]
+            elif message[0] == "status":
+                self._status = message[1]
+            else:
+                self._messages.append(message)
+
+    def drain(self):
+        """取出所有待处理的消息，返回 (最新进度或 None, 最新状态或 None, 消息列表)"""
+        with self._lock:
+            progress, self._progress = self._progress, None
+            status, self._status = self._status, None
+            messages = list(self._messages)
+            self._messages.clear()
+        return progress, status, messages
+
+def format_duration(seconds):
+    """将秒数格式化为便于阅读的文本"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} 秒"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} 分 {seconds} 秒"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} 小时 {minutes} 分"
+
+class ProgressReporter:
+    """
+    按时间间隔限制进度消息的频率，最后一项完成时一定会发送
+    属于 ProgressPhases 的某个阶段时，进度映射到总进度中该阶段所占的区间，并同时发送阶段名称和剩余时间
+    """
+    def __init__(self, queue, total, interval=PROGRESS_INTERVAL, phases=None, start=0.0, span=1.0, label=None):
+        self.queue = queue
+        self.total = max(total, 1)
+        self.interval = interval
+        self.phases = phases
+        self.start = start
+        self.span = span
+        self.label = label
+        self.done = 0
+        self.started = time.perf_counter()
+        self._last_post = 0.0
+
+    def advance(self, count=1):
+        """完成 count 项"""
+        self.update(self.done + count)
+
+    def update(self, done):
+        """设置已完成的项数，可以是小数（如单个大文件读取了一部分）"""
+        self.done = done
+        now = time.perf_counter()
+        if done >= self.total or now - self._last_post >= self.interval:
+            self._last_post = now
+            fraction = min(done / self.total, 1.0)
+            self.queue.put(("progress", self.start + self.span * fraction))
+            if self.label is not None:
+                self.queue.put(("status", self._status_text(fraction, now)))
+
+    def _status_text(self, fraction, now):
+        text = f"{self.label} {int(self.done)}/{self.total}"
+        eta = self.phases.estimate_remaining(self, fraction, now) if self.phases is not None else None
+        if eta is not None:
+            text += f"，预计剩余 {format_duration(eta)}"
+        return text
+
+class ProgressPhases:
+    """
+    把一次任务分为带权重的阶段（读取、校验、合并、计算、写出），各阶段的进度按权重映射到总进度，
+    并根据实测的处理速度估算剩余时间
+    每个阶段结束时发送 ("timing", {"phase": 阶段, "seconds": 耗时, "items": 处理的项数}) 消息
+    """
+    # 开始估算剩余时间前至少经过的秒数，避免刚开始时估计值剧烈跳动
+    ETA_WARMUP = 1.0
+
+    def __init__(self, queue, weights, interval=PROGRESS_INTERVAL):
+        self.queue = queue
+        self.interval = interval
+        self.started = time.perf_counter()
+        total_weight = sum(weights.values()) or 1
+        self._ranges = {}
+        offset = 0.0
+        for name, weight in weights.items():
+            self._ranges[name] = (offset / total_weight, weight / total_weight)
+            offset += weight
+        self._current = None
+
+    def _close_phase(self):
+        """结束当前阶段并发送其耗时"""
+        if self._current is None:
+            return
+        name, reporter = self._current
+        self._current = None
+        self.queue.put(("timing", {"phase": name, "seconds": time.perf_counter() - reporter.started,
+                                   "items": reporter.done}))
+
+    def phase(self, name, total):
+        """开始一个阶段，返回该阶段的 ProgressReporter，total 为该阶段要处理的项数"""
+        self._close_phase()
+        start, span = self._ranges[name]
+        reporter = ProgressReporter(self.queue, total, self.interval, self, start, span, PHASE_LABELS[name])
+        reporter.update(0)
+        self._current = (name, reporter)
+        return reporter
+
+    def estimate_remaining(self, reporter, fraction, now):
+        """
+        当前阶段按本阶段的处理速度估算，之后的阶段按目前为止每单位权重的平均耗时估算
+        数据不足时返回 None
+        """
+        elapsed = now - self.started
+        phase_elapsed = now - reporter.started
+        overall = reporter.start + reporter.span * fraction
+        if elapsed < self.ETA_WARMUP or fraction <= 0 or overall <= 0:
+            return None
+        phase_remaining = phase_elapsed * (1 - fraction) / fraction
+        later = 1.0 - (reporter.start + reporter.span)
+        return phase_remaining + later * elapsed / overall
+
+    def finish(self):
+        """任务完成，进度设为 100% 并清除状态"""
+        self._close_phase()
+        self.queue.put(("progress", 1.0))
+        self.queue.put(("status", ""))
+
+# 三种报表共用的数据缓存
+dataset_cache = DatasetCache()
+columnar_cache = ColumnarCache(CACHE_DIRECTORY)
+
+# 子进程读取文件时用于取消的事件，由 _init_reader 设置
+_reader_cancel_event = None
+
+def _init_reader(cancel_event):
+    """读取进程的初始化函数"""
+    global _reader_cancel_event
+    _reader_cancel_event = cancel_event
+
+def _read_workbook(file, required_columns, is_canceled_callback=None, on_progress=None, columns=None):
+    """
+    读取并校验单个 Excel 文件（可在子进程中运行），返回 (DataFrame, 文件签名, 错误信息)
+    columns 不为 None 时只读取这些列；大文件读取过程中被取消时抛出 OperationCanceled
+    """
+    if is_canceled_callback is None and _reader_cancel_event is not None:
+        is_canceled_callback = _reader_cancel_event.is_set
+    try:
+        signature, df = DataProcessor.parse_excel(file, is_canceled_callback, on_progress, columns)
+    except OperationCanceled:
+        raise
+    except Exception as e:
+        return None, None, f"无法读取文件 {os.path.basename(file)}: {str(e)}"
+    missing = DataProcessor.find_missing_column(df, required_columns)
+    if missing is not None:
+        return None, None, f"文件 {os.path.basename(file)} 缺少必要的列: '{missing}'"
+    return df, signature, None
+
+def _preflight_workbook(file, required_columns, columns, is_canceled_callback=None):
+    """
+    预检单个文件（可在子进程中运行）：先只读取表头，缺少必要列时不再读取数据
+    返回 (DataFrame 或 None, 文件签名, 问题列表)；大文件读取过程中被取消时抛出 OperationCanceled
+    """
+    if is_canceled_callback is None and _reader_cancel_event is not None:
+        is_canceled_callback = _reader_cancel_event.is_set
+    try:
+        header = DataProcessor.read_header(file)
+        missing = [col for col in required_columns if col not in header]
+        if missing:
+            return None, None, [f"缺少必要的列: {'、'.join(repr(col) for col in missing)}"]
+        signature, df = DataProcessor.parse_excel(file, is_canceled_callback, columns=columns)
+    except OperationCanceled:
+        raise
+    except Exception as e:
+        return None, None, [f"无法读取: {str(e)}"]
+    return df, signature, []
+
+def _chunked(iterable, size):
+    """将可迭代对象按 size 个一组切分为列表，惰性生成"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def run_in_process_pool(func, chunks, extra_args, workers, is_canceled_callback, on_result, initializer=None):
+    """
+    将 chunks 逐块提交到进程池执行 func(chunk, *extra_args)，同时在途的任务不超过 2 × workers 个，
+    chunks 可以是生成器，从而限制内存占用
+    每完成一块调用 on_result(chunk, 结果)，子进程出错时结果为异常对象；取消时返回 False
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+    max_in_flight = 2 * workers
+    pending = iter(chunks)
+    in_flight = {}
+    try:
+        while True:
+            if is_canceled_callback():
+                for future in in_flight:
+                    future.cancel()
+                return False
+            while len(in_flight) < max_in_flight:
+                chunk = next(pending, None)
+                if chunk is None:
+                    break
+                in_flight[executor.submit(func, chunk, *extra_args)] = chunk
+            if not in_flight:
+                return True
+            done, _ = wait(in_flight, timeout=0.1)
+            for future in done:
+                chunk = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                on_result(chunk, result)
+    finally:
+        executor.shutdown(wait=False)
+
+class StreamingWorkbook:
+    """
+    逐行流式写入的 Excel 工作簿，可包含多个工作表，内存占用与行数无关
+    优先使用 xlsxwriter 的 constant_memory 模式，未安装时使用 openpyxl 的只写模式
+    """
+    # Excel 对工作表名称的限制
+    SHEET_NAME_MAX_LENGTH = 31
+    SHEET_NAME_INVALID_CHARS = '[]:*?/\\'
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self._sheet_names = set()
+        # 未安装 xlsxwriter 时使用 openpyxl 的只写模式
+        self._xlsxwriter = _optional_module("xlsxwriter")
+        if self._xlsxwriter is not None:
+            self._workbook = self._xlsxwriter.Workbook(output_file, {'constant_memory': True,
+                                                              'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+        else:
+            from openpyxl import Workbook
+            self._workbook = Workbook(write_only=True)
+
+    def add_sheet(self, df, sheet_name="Sheet1"):
+        """将DataFrame写入新的工作表（不含索引），重名或含非法字符的名称会自动调整"""
+        sheet_name = self._unique_sheet_name(sheet_name)
+        if self._xlsxwriter is not None:
+            worksheet = self._workbook.add_worksheet(sheet_name)
+            write_row = lambda row_idx, values: worksheet.write_row(row_idx, 0, values)
+        else:
+            worksheet = self._workbook.create_sheet(sheet_name)
+            write_row = lambda row_idx, values: worksheet.append(values)
+
+        write_row(0, [str(col) for col in df.columns])
+        for row_idx, values in enumerate(self._iter_rows(df), start=1):
+            write_row(row_idx, values)
+
+    def close(self):
+        """写出文件，文件被占用时抛出 PermissionError"""
+        if self._xlsxwriter is None:
+            self._workbook.save(self.output_file)
+            return
+        try:
+            self._workbook.close()
+        except self._xlsxwriter.exceptions.FileCreateError as e:
+            raise PermissionError(str(e)) from e
+
+    def _unique_sheet_name(self, name):
+        name = ''.join('_' if char in self.SHEET_NAME_INVALID_CHARS else char for char in str(name))
+        name = name.strip("'")[:self.SHEET_NAME_MAX_LENGTH] or "Sheet"
+        candidate, suffix = name, 2
+        # 工作表名称不区分大小写
+        while candidate.lower() in self._sheet_names:
+            tail = f"({suffix})"
+            candidate = name[:self.SHEET_NAME_MAX_LENGTH - len(tail)] + tail
+            suffix += 1
+        self._sheet_names.add(candidate.lower())
+        return candidate
 
-    def load_files(self):
-        """选择文件并更新列表"""
-        filepaths = filedialog.askopenfilenames(title="选择文件", filetypes=[("Excel files", "*.xlsx")])
-        self.filepaths = filepaths
-        return self.filepaths
+    @staticmethod
+    def _iter_rows(df):
+        """按批将DataFrame转换为可直接写入Excel的行，缺失值转换为空单元格"""
+        for start in range(0, len(df), EXCEL_WRITE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + EXCEL_WRITE_CHUNK_ROWS]
+            columns = [chunk[col].astype(object).where(chunk[col].notna(), None).tolist() for col in chunk.columns]
+            yield from (list(values) for values in zip(*columns))
+
+class PreflightResult:
+    """单个文件的预检结果"""
+    def __init__(self, file, exam_numbers=(), problems=()):
+        self.file = file
+        self.exam_numbers = list(exam_numbers)
+        self.problems = list(problems)
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def messages(self):
+        """带文件名的问题说明"""
+        return [f"文件 {os.path.basename(self.file)}：{problem}" for problem in self.problems]
 
 class DataProcessor:
     """处理Excel文件的通用方法"""
     @staticmethod
-    def read_excel(file, queue):
-        """读取Excel文件并返回DataFrame"""
+    def parse_excel(file, is_canceled_callback=None, on_progress=None, columns=None):
+        """
+        解析Excel文件（优先使用磁盘缓存），返回 (文件签名, DataFrame)，失败时抛出异常
+        columns 不为 None 时只读取这些列（见 read_excel_projected）
+        提供 is_canceled_callback 时，大文件逐块读取，可以中途取消（抛出 OperationCanceled），
+        并通过 on_progress(已读取的比例) 汇报进度
+        """
+        # 在读取前记录文件状态，避免读取期间文件被修改导致缓存错误
+        signature = DatasetCache.signature(file)
+        digest = ColumnarCache.content_hash(file) if columnar_cache.enabled else None
+        df = columnar_cache.load(digest, columns) if digest else None
+        if df is None:
+            large = signature[1] >= LARGE_WORKBOOK_SIZE
+            if columns is not None:
+                df = DataProcessor.read_excel_projected(file, columns, is_canceled_callback if large else None,
+                                                        on_progress)
+            elif is_canceled_callback is not None and large:
+                df = DataProcessor.read_excel_chunked(file, is_canceled_callback, on_progress)
+            else:
+                df = pd.read_excel(file)
+            if digest:
+                columnar_cache.store(digest, df, columns)
+        return signature, df
+
+    @staticmethod
+    def _convert_cell(cell):
+        """与 pandas 的 openpyxl 读取器相同的单元格转换规则"""
+        from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+        if cell.value is None:
+            return ""
+        elif cell.data_type == TYPE_ERROR:
+            return np.nan
+        elif cell.data_type == TYPE_NUMERIC:
+            value = int(cell.value)
+            if value == cell.value:
+                return value
+            return float(cell.value)
+        return cell.value
+
+    @staticmethod
+    def read_excel_chunked(file, is_canceled_callback, on_progress=None):
+        """
+        使用 openpyxl 只读模式逐行读取第一个工作表，每 READ_CHUNK_ROWS 行检查一次是否取消并汇报进度
+        单元格转换和类型推断与 pandas.read_excel 相同；取消时抛出 OperationCanceled
+        """
+        import openpyxl
+        from pandas.io.parsers import TextParser
+
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
         try:
-            df = pd.read_excel(file)
-            return df
-        except Exception as e:
-            queue.put(("error", f"无法读取文件 {os.path.basename(file)}: {str(e)}"))
-            return None
+            sheet = workbook.worksheets[0]
+            # 工作表声明的行数只用于估算进度，读取时与 pandas 一样忽略声明的范围
+            total_rows = sheet.max_row or 0
+            sheet.reset_dimensions()
+
+            data = []
+            last_row_with_data = -1
+            for row_number, row in enumerate(sheet.rows):
+                if row_number % READ_CHUNK_ROWS == 0:
+                    if is_canceled_callback():
+                        raise OperationCanceled()
+                    if on_progress is not None and total_rows:
+                        on_progress(min(row_number / total_rows, 1.0))
+                converted_row = [DataProcessor._convert_cell(cell) for cell in row]
+                # 去掉行尾的空单元格和末尾的空行
+                while converted_row and converted_row[-1] == "":
+                    converted_row.pop()
+                if converted_row:
+                    last_row_with_data = row_number
+                data.append(converted_row)
+        finally:
+            workbook.close()
+
+        data = data[:last_row_with_data + 1]
+        if not data:
+            return pd.DataFrame()
+        max_width = max(len(row) for row in data)
+        data = [row + [""] * (max_width - len(row)) for row in data]
+        return TextParser(data, header=0, skip_blank_lines=False).read()
+
+    @staticmethod
+    def _value_converter():
+        """返回与 _convert_cell 规则相同的转换函数，用于只读模式下的单元格值（错误值以文本返回）"""
+        from openpyxl.cell.cell import ERROR_CODES
+
+        def convert(value):
+            if value is None:
+                return ""
+            if isinstance(value, float):
+                return int(value) if value.is_integer() else value
+            if isinstance(value, str) and value in ERROR_CODES:
+                return np.nan
+            return value
+        return convert
+
+    @staticmethod
+    def _header_names(row, convert):
+        """将表头行转换为列名，去重和空列名的处理与 pandas.read_excel 相同"""
+        from pandas.io.parsers import TextParser
+
+        header = [convert(value) for value in row]
+        while header and header[-1] == "":
+            header.pop()
+        if not header:
+            return []
+        return list(TextParser([header], header=0).read().columns)
 
     @staticmethod
-    def validate_data(df, required_columns, queue):
-        """验证DataFrame的列是否完整"""
+    def read_header(file):
+        """只读取第一个工作表的表头，返回列名列表"""
+        if _optional_module("python_calamine") is not None:
+            return list(pd.read_excel(file, engine="calamine", nrows=0).columns)
+
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+        try:
+            sheet = workbook.worksheets[0]
+            sheet.reset_dimensions()
+            row = next(sheet.iter_rows(values_only=True), ())
+            return DataProcessor._header_names(row, DataProcessor._value_converter())
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def read_excel_projected(file, columns, is_canceled_callback=None, on_progress=None):
+        """
+        只读取第一个工作表中列名在 columns 中的列（文件中没有的列忽略），列的顺序与文件相同
+        没有提供 is_canceled_callback 且安装了 python-calamine 时使用 calamine 引擎（一次读完，不能取消）；
+        否则使用 openpyxl 只读模式逐行读取，只转换需要的列，
+        提供 is_canceled_callback 时每 READ_CHUNK_ROWS 行检查一次是否取消（抛出 OperationCanceled）并汇报进度
+        单元格转换和类型推断与 pandas.read_excel 相同
+        """
+        wanted = set(columns)
+        if is_canceled_callback is None and _optional_module("python_calamine") is not None:
+            return pd.read_excel(file, engine="calamine", usecols=lambda col: col in wanted)
+
+        import openpyxl
+        from pandas.io.parsers import TextParser
+
+        convert = DataProcessor._value_converter()
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+        try:
+            sheet = workbook.worksheets[0]
+            total_rows = sheet.max_row or 0
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(values_only=True)
+
+            names = DataProcessor._header_names(next(rows, ()), convert)
+            if not names:
+                return pd.DataFrame()
+            indices = [idx for idx, name in enumerate(names) if name in wanted]
+
+            data = [[names[idx] for idx in indices]]
+            last_row_with_data = 0
+            for row_number, row in enumerate(rows, start=1):
+                if is_canceled_callback is not None and row_number % READ_CHUNK_ROWS == 0:
+                    if is_canceled_callback():
+                        raise OperationCanceled()
+                    if on_progress is not None and total_rows:
+                        on_progress(min(row_number / total_rows, 1.0))
+                # 与完整读取一样，只去掉末尾整行为空的行
+                if row.count(None) != len(row):
+                    last_row_with_data = row_number
+                data.append([convert(row[idx]) if idx < len(row) else "" for idx in indices])
+        finally:
+            workbook.close()
+
+        return TextParser(data[:last_row_with_data + 1], header=0, skip_blank_lines=False).read()
+
+    @staticmethod
+    def write_excel(df, output_file, streaming=False):
+        """
+        将DataFrame写入Excel文件（不含索引），文件被占用时抛出 PermissionError
+        streaming 为 True 时逐行流式写入，内存占用与行数无关（不设置表头样式）
+        """
+        if not streaming:
+            df.to_excel(output_file, index=False)
+            return
+
+        workbook = StreamingWorkbook(output_file)
+        workbook.add_sheet(df)
+        workbook.close()
+
+    @staticmethod
+    def format_class_name(value):
+        """将班级转换为可用于文件名的文本，缺失时归入“未分班”"""
+        if pd.isna(value):
+            return "未分班"
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    @staticmethod
+    def find_missing_column(df, required_columns):
+        """返回第一个缺失的必要列，列完整时返回 None"""
         for col in required_columns:
             if col not in df.columns:
-                queue.put(("error", f"文件缺少必要的列: '{col}'"))
-                return False
-        return True
+                return col
+        return None
 
     @staticmethod
     def check_duplicate_exam_numbers(current_exam_numbers, all_exam_numbers, queue):
@@ -52,471 +786,1652 @@ class DataProcessor:
             all_exam_numbers.add(exam_no)
         return duplicate_exam_numbers
 
-class ProgressCalculator:
-    """生成进退步系数报表"""
-    
     @staticmethod
-    def calculate_progress(filepaths, is_canceled_callback, queue):
-        exam_data = {}
-        exam_numbers = []
-        all_exam_numbers = set()  # 用于存储所有考试编号
+    def preflight(filepaths, required_columns=REQUIRED_COLUMNS, is_canceled_callback=None, max_workers=None,
+                  columns=PREFLIGHT_COLUMNS, state=None):
+        """
+        预检所有文件，一次找出所有问题：先只读取表头，缺少必要列的文件不再继续读取；
+        其余文件读取 columns 列（默认只有考试编号）并放入缓存，检查考试编号是否为空、是否与其他文件重复
+        state 为 ProgressState 时，签名与状态一致的已处理文件不再读取，其余文件的考试编号还要与 state.exam_values 比较
+        返回与 filepaths 顺序相同的 PreflightResult 列表，取消时返回 None
+        """
+        if is_canceled_callback is None:
+            is_canceled_callback = lambda: False
+        checked = [None] * len(filepaths)
+        pending = []
+        for idx, file in enumerate(filepaths):
+            if state is not None and DataProcessor._is_processed(file, state):
+                checked[idx] = (None, None, [])
+                continue
+            df = dataset_cache.get(file, columns)
+            if df is None:
+                pending.append(idx)
+            else:
+                checked[idx] = (df, None, [])
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = min(max_workers, len(pending))
+        if max_workers <= 1:
+            for idx in pending:
+                if is_canceled_callback():
+                    return None
+                try:
+                    checked[idx] = _preflight_workbook(filepaths[idx], required_columns, columns, is_canceled_callback)
+                except OperationCanceled:
+                    return None
+        else:
+            cancel_event = multiprocessing.Event()
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_reader, initargs=(cancel_event,))
+            futures = {executor.submit(_preflight_workbook, filepaths[idx], required_columns, columns): idx
+                       for idx in pending}
+            not_done = set(futures)
+            try:
+                while not_done:
+                    if is_canceled_callback():
+                        cancel_event.set()
+                        for future in not_done:
+                            future.cancel()
+                        return None
+                    done, not_done = wait(not_done, timeout=0.1)
+                    for future in done:
+                        try:
+                            checked[futures[future]] = future.result()
+                        except Exception as e:
+                            checked[futures[future]] = (None, None, [f"无法读取: {str(e)}"])
+            finally:
+                executor.shutdown(wait=False)
+
+        results = []
+        exam_files = collections.defaultdict(list)  # 考试编号 -> 包含该编号的文件
+        for idx, (df, signature, problems) in enumerate(checked):
+            file = filepaths[idx]
+            exam_numbers = []
+            if df is not None:
+                if signature is not None:
+                    dataset_cache.put(file, signature, df, columns)
+                exam_numbers = sorted(df['考试编号'].dropna().unique().tolist(), key=str)
+                if not exam_numbers:
+                    problems = problems + ["没有有效的考试编号"]
+            for exam_no in exam_numbers:
+                exam_files[exam_no].append(idx)
+                if state is not None and exam_no in state.exam_values:
+                    problems = problems + [f"考试编号 {exam_no} 与已处理的文件重复"]
+            results.append(PreflightResult(file, exam_numbers, problems))
+
+        # 不同文件的考试编号不能重复
+        for exam_no, indices in exam_files.items():
+            if len(indices) < 2:
+                continue
+            for idx in indices:
+                others = "、".join(os.path.basename(filepaths[other]) for other in indices if other != idx)
+                results[idx].problems.append(f"考试编号 {exam_no} 与 {others} 重复")
+        return results
 
-        # 计算进退步系数
-        for file in filepaths:
-            if is_canceled_callback():
-                queue.put(("info", "操作已取消"))
-                return None
+    @staticmethod
+    def _is_processed(file, state):
+        """文件是否已由增量计算状态记录且之后没有被修改"""
+        signature = state.files.get(os.path.abspath(file))
+        try:
+            return signature is not None and DatasetCache.signature(file) == signature
+        except OSError:
+            return False
 
-            df = DataProcessor.read_excel(file, queue)
+    @staticmethod
+    def load_files(filepaths, required_columns, is_canceled_callback, queue, max_workers=None, phases=None,
+                   columns=None):
+        """
+        并行读取并校验所有文件，按 filepaths 的顺序返回 DataFrame 列表
+        读取失败、缺少列、考试编号重复或操作取消时返回 None
+        phases 为 ProgressPhases 时汇报“读取”和“校验”阶段的进度
+        columns 不为 None 时只读取这些列（应包含 required_columns），None 表示读取所有列
+        """
+        if phases is None:
+            phases = ProgressPhases(queue, {"read": 9, "validate": 1})
+        reader = phases.phase("read", len(filepaths))
+        results = [None] * len(filepaths)
+        pending = []
+        for idx, file in enumerate(filepaths):
+            df = dataset_cache.get(file, columns)
             if df is None:
+                pending.append(idx)
+                continue
+            missing = DataProcessor.find_missing_column(df, required_columns)
+            if missing is not None:
+                results[idx] = (None, None, f"文件 {os.path.basename(file)} 缺少必要的列: '{missing}'")
+            else:
+                results[idx] = (df, None, None)
+        reader.update(len(filepaths) - len(pending))
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = min(max_workers, len(pending))
+
+        if max_workers <= 1:
+            # 单个文件或单核时直接在当前线程读取，大文件每读取一块检查一次是否取消
+            for idx in pending:
+                if is_canceled_callback():
+                    queue.put(("info", "操作已取消"))
+                    return None
+                finished = reader.done
+                try:
+                    results[idx] = _read_workbook(filepaths[idx], required_columns, is_canceled_callback,
+                                                  lambda fraction: reader.update(finished + fraction), columns)
+                except OperationCanceled:
+                    queue.put(("info", "操作已取消"))
+                    return None
+                reader.update(finished + 1)
+                if results[idx][2] is not None:
+                    break
+        else:
+            # openpyxl 解析受 GIL 限制，使用进程池并行读取；取消时通过事件通知子进程停止读取大文件
+            cancel_event = multiprocessing.Event()
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_reader, initargs=(cancel_event,))
+            futures = {executor.submit(_read_workbook, filepaths[idx], required_columns, columns=columns): idx
+                       for idx in pending}
+            not_done = set(futures)
+            try:
+                while not_done:
+                    if is_canceled_callback():
+                        cancel_event.set()
+                        for future in not_done:
+                            future.cancel()
+                        queue.put(("info", "操作已取消"))
+                        return None
+                    done, not_done = wait(not_done, timeout=0.1)
+                    for future in done:
+                        idx = futures[future]
+                        try:
+                            results[idx] = future.result()
+                        except Exception as e:
+                            results[idx] = (None, None, f"无法读取文件 {os.path.basename(filepaths[idx])}: {str(e)}")
+                    reader.advance(len(done))
+            finally:
+                executor.shutdown(wait=False)
+
+        for idx in pending:
+            if results[idx] is not None and results[idx][0] is not None:
+                df, signature, _ = results[idx]
+                dataset_cache.put(filepaths[idx], signature, df, columns)
+                results[idx] = (df.copy(), signature, None)
+
+        # 按文件顺序报告错误并检查重复考试编号，保证结果与串行读取一致
+        validator = phases.phase("validate", len(results))
+        frames = []
+        all_exam_numbers = set()
+        for df, _, error in results:
+            if error is not None:
+                queue.put(("error", error))
                 return None
-
-            if not DataProcessor.validate_data(df, ['考试编号', '姓名', '级名'], queue):
-                return None
-
             current_exam_numbers = set(df['考试编号'])
             duplicate_exam_numbers = DataProcessor.check_duplicate_exam_numbers(current_exam_numbers, all_exam_numbers, queue)
             if duplicate_exam_numbers:
                 queue.put(("error", f"发现重复的考试编号: {', '.join(map(str, duplicate_exam_numbers))}"))
                 return None
+            frames.append(df)
+            validator.advance()
+        queue.put(("stats", {"rows": sum(len(df) for df in frames)}))
+        return frames
+
+class ExamHistory:
+    """合并后的历次考试数据"""
+    def __init__(self, df):
+        self.df = df
+        self._sorted_df = None
+        self._store = None
+
+    @classmethod
+    def build(cls, frames, queue):
+        """一次性合并各次考试的数据，并在加载时压缩列类型"""
+        if not frames:
+            return cls(pd.DataFrame())
+
+        df = pd.concat(frames, ignore_index=True)
+
+        # 考试编号统一为数值类型，删除无效考试编号的行
+        df['考试编号'] = pd.to_numeric(df['考试编号'], errors='coerce')
+        invalid_rows = int(df['考试编号'].isna().sum())
+        if invalid_rows:
+            df = df.dropna(subset=['考试编号']).reset_index(drop=True)
+            queue.put(("log", f"已忽略 {invalid_rows} 行无效考试编号的数据"))
+        df['考试编号'] = pd.to_numeric(df['考试编号'], downcast='integer')
+
+        # 姓名重复度高，使用分类类型；排名为数值时使用最小的整数类型
+        df['姓名'] = df['姓名'].astype('category')
+        if pd.api.types.is_numeric_dtype(df['级名']):
+            df['级名'] = pd.to_numeric(df['级名'], downcast='integer')
+
+        history = cls(df)
+        store = history.store
+        queue.put(("stats", {"students": history.student_count}))
+        queue.put(("log", f"已合并 {len(frames)} 个文件，共 {len(df)} 行，占用内存 {history.memory_usage() / 1024 / 1024:.2f} MB"))
+        queue.put(("log", f"学生索引：{len(store)} 位学生 × {len(store.exam_numbers)} 次考试，占用内存 {store.memory_usage() / 1024 / 1024:.2f} MB"))
+        return history
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def memory_usage(self):
+        """返回合并数据占用的字节数"""
+        return int(self.df.memory_usage(deep=True).sum())
+
+    @property
+    def student_count(self):
+        return len(self.store)
+
+    @property
+    def sorted_df(self):
+        """按考试编号稳定排序后的数据，只排序一次"""
+        if self._sorted_df is None:
+            self._sorted_df = self.df.sort_values(by='考试编号', kind='stable', ignore_index=True)
+        return self._sorted_df
+
+    def row_hashes(self, columns=None):
+        """按 sorted_df 的行顺序返回每行内容的 64 位哈希，iter_students 返回数据的索引可直接用于取值"""
+        df = self.sorted_df if columns is None else self.sorted_df[columns]
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    @property
+    def store(self):
+        """按学生索引的历史数据，只构建一次"""
+        if self._store is None:
+            self._store = StudentHistoryStore.build(self)
+        return self._store
+
+    def iter_students(self):
+        """
+        逐个返回 (姓名, 按考试编号排序的数据)，顺序与学生首次出现的顺序一致
+        每位学生按 StudentHistoryStore 中的行号直接取数据
+        """
+        store = self.store
+        for student_id, student in enumerate(store.students):
+            yield student, store.rows(student_id)
+
+class StudentHistoryStore:
+    """
+    按学生索引的历次考试数据，由 ExamHistory 构建一次，各报表共用
+    姓名按首次出现的顺序编号，排名保存为 学生 × 考试 的矩阵（排名都是整数时使用 int32），mask 标记学生是否参加了该次考试
+    每位学生在 sorted_df 中的行号按考试编号顺序连续存放，取一位学生的历史只需 O(考试次数)
+    """
+    def __init__(self, df, students, exam_numbers, ranks, mask, row_offsets, row_order):
+        self.df = df  # 按考试编号排序后的合并数据
+        self.students = students  # 学生编号 -> 姓名
+        self.index = {student: student_id for student_id, student in enumerate(students)}  # 姓名 -> 学生编号
+        self.exam_numbers = exam_numbers  # 排好序的考试编号
+        self.ranks = ranks
+        self.mask = mask
+        self.row_offsets = row_offsets  # 第 i 位学生的行号为 row_order[row_offsets[i]:row_offsets[i + 1]]
+        self.row_order = row_order
+        self._names = None
+
+    @classmethod
+    def build(cls, history):
+        df = history.sorted_df
+        names = df['姓名']
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype('category')
+        codes = names.cat.codes.to_numpy()
+
+        # 学生编号按在原始数据中首次出现的顺序分配，姓名为空的行不属于任何学生
+        original_codes = pd.Categorical(history.df['姓名'], categories=names.cat.categories).codes
+        first_seen = pd.unique(original_codes[original_codes >= 0])
+        code_to_id = np.full(len(names.cat.categories) + 1, -1, dtype=np.int64)
+        code_to_id[first_seen] = np.arange(len(first_seen))
+        student_ids = code_to_id[codes]  # codes 为 -1 时取到末尾的 -1
+        students = names.cat.categories.to_numpy()[first_seen]
+
+        # sorted_df 已按考试编号稳定排序，按学生编号稳定排序后每位学生的行仍按考试编号排列
+        valid = student_ids >= 0
+        row_order = np.flatnonzero(valid)
+        row_order = row_order[np.argsort(student_ids[row_order], kind='stable')]
+        row_offsets = np.zeros(len(students) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(student_ids[valid], minlength=len(students)), out=row_offsets[1:])
+
+        exam_numbers, exam_ids = np.unique(df['考试编号'].to_numpy(), return_inverse=True)
+        ranks = pd.to_numeric(df['级名'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        mask = np.zeros((len(students), len(exam_numbers)), dtype=bool)
+        mask[student_ids[valid], exam_ids[valid]] = True
+
+        # 同一次考试有多行时与进退步系数一致，以最后一行为准
+        present = ranks[valid]
+        integer_ranks = (np.isfinite(present).all() and np.array_equal(present, np.round(present))
+                         and (present.size == 0 or np.abs(present).max() <= np.iinfo(np.int32).max))
+        if integer_ranks:
+            matrix = np.zeros(mask.shape, dtype=np.int32)
+            matrix[student_ids[valid], exam_ids[valid]] = present.astype(np.int32)
+        else:
+            matrix = np.full(mask.shape, np.nan)
+            matrix[student_ids[valid], exam_ids[valid]] = present
+        return cls(df, students, exam_numbers, matrix, mask, row_offsets, row_order)
+
+    def __len__(self):
+        return len(self.students)
+
+    def student_id(self, student):
+        """返回学生编号，没有该学生时返回 None"""
+        return self.index.get(student)
+
+    def search(self, text):
+        """返回姓名包含 text（不区分大小写）的学生编号，按编号排序；text 为空时返回所有学生"""
+        if not text:
+            return np.arange(len(self.students))
+        if self._names is None:
+            self._names = pd.Series(self.students, dtype=object).astype(str)
+        return np.flatnonzero(self._names.str.contains(text, case=False, regex=False).to_numpy())
+
+    def history(self, student_id):
+        """返回 (参加过的考试编号, 对应的排名)，按考试编号排序"""
+        attended = self.mask[student_id]
+        return self.exam_numbers[attended], self.ranks[student_id, attended]
+
+    def row_positions(self, student_id):
+        """返回学生在 df 中的行号，按考试编号排序"""
+        return self.row_order[self.row_offsets[student_id]:self.row_offsets[student_id + 1]]
+
+    def rows(self, student_id):
+        """返回学生的所有数据（包含所有列），按考试编号排序"""
+        return self.df.iloc[self.row_positions(student_id)]
+
+    def last_values(self, column):
+        """返回每位学生最后一次考试中 column 列的值"""
+        return self.df[column].to_numpy()[self.row_order[self.row_offsets[1:] - 1]]
+
+    def memory_usage(self):
+        """返回索引占用的字节数（不含 df）"""
+        arrays = (self.students, self.exam_numbers, self.ranks, self.mask, self.row_offsets, self.row_order)
+        return (sum(array.nbytes for array in arrays) + sys.getsizeof(self.index)
+                + sum(sys.getsizeof(student) for student in self.students))
+
+class OutputManifest:
+    """
+    输出目录中的清单，记录每个输出文件的内容指纹和写出后的文件状态
+    再次生成时跳过指纹相同且没有被改动或删除的文件
+    """
+    # 输出内容或格式变化时递增，使旧清单自动失效
+    VERSION = 1
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries if entries is not None else {}  # 文件名 -> [指纹, 修改时间, 大小]
+
+    @classmethod
+    def load(cls, path):
+        """读取清单，不存在、已损坏或版本不符时返回空清单"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == cls.VERSION and isinstance(data.get("entries"), dict):
+                return cls(path, data["entries"])
+        except (OSError, ValueError):
+            pass
+        return cls(path)
+
+    @classmethod
+    def new_fingerprint(cls, options):
+        """返回以输出选项为初值的哈希对象，之后用每位学生数据的行哈希更新"""
+        return hashlib.sha256(json.dumps([cls.VERSION, options], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+    def is_current(self, output_file, fingerprint):
+        """输出文件的指纹是否未变，且文件在上次写出后没有被改动或删除"""
+        entry = self.entries.get(os.path.basename(output_file))
+        if not entry or entry[0] != fingerprint:
+            return False
+        try:
+            return DatasetCache.signature(output_file) == tuple(entry[1:])
+        except OSError:
+            return False
 
-            exam_number = df['考试编号'].max()  # 获取最大考试编号
-            exam_numbers.append(exam_number)
+    def record(self, output_file, fingerprint):
+        """记录成功写出的文件"""
+        try:
+            self.entries[os.path.basename(output_file)] = [fingerprint, *DatasetCache.signature(output_file)]
+        except OSError:
+            self.entries.pop(os.path.basename(output_file), None)
 
-            for _, row in df.iterrows():
-                student = row['姓名']
-                rank = row['级名']
-                if student not in exam_data:
-                    exam_data[student] = {}
-                exam_data[student][exam_number] = rank
+    def save(self):
+        """写入清单（先写临时文件再替换），失败时抛出 OSError"""
+        temp_path = _temp_path(self.path)
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "entries": self.entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
 
-        exam_numbers.sort(reverse=True)
-        all_exam_numbers = exam_numbers
-        progress_data = []
+    def save_or_warn(self, queue):
+        try:
+            self.save()
+        except OSError as e:
+            queue.put(("warning", f"无法保存输出清单 {os.path.basename(self.path)}: {str(e)}"))
 
-        for student in exam_data.keys():
-            if is_canceled_callback():
-                queue.put(("info", "操作已取消"))
+class ProgressState:
+    """增量计算进退步系数的状态：已处理文件的签名、出现过的考试编号和排名矩阵"""
+    # 状态格式变化时递增，使旧状态自动失效
+    VERSION = 1
+
+    def __init__(self, files, exam_values, rank_matrix, integer_ranks):
+        self.files = files  # 文件绝对路径 -> (修改时间, 大小)
+        self.exam_values = exam_values  # 所有已处理文件中出现过的考试编号
+        self.rank_matrix = rank_matrix  # ProgressCalculator.build_rank_matrix 的结果
+        self.integer_ranks = integer_ranks
+
+    @staticmethod
+    def _plain(value):
+        """numpy 标量转为 Python 标量，便于写入 JSON"""
+        return value.item() if isinstance(value, np.generic) else value
+
+    @classmethod
+    def load(cls, path):
+        """读取状态文件，不存在、已损坏或版本不符时返回 None"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != cls.VERSION:
                 return None
+            students = np.empty(len(data["students"]), dtype=object)
+            students[:] = data["students"]
+            exam_numbers = data["exam_numbers"]
+            shape = (len(students), len(exam_numbers))
+            matrix = np.array(data["ranks"], dtype=float).reshape(shape)
+            present = np.array([np.frombuffer(row.encode("ascii"), dtype=np.uint8) == ord("1") for row in data["present"]],
+                               dtype=bool).reshape(shape)
+            files = {file: tuple(signature) for file, signature in data["files"]}
+            return cls(files, set(data["exam_values"]), (students, exam_numbers, matrix, present), data["integer_ranks"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, path):
+        """写入状态文件（先写临时文件再替换，避免中断时留下不完整的状态）"""
+        students, exam_numbers, matrix, present = self.rank_matrix
+        data = {
+            "version": self.VERSION,
+            "files": [[file, list(signature)] for file, signature in self.files.items()],
+            "exam_values": [self._plain(value) for value in self.exam_values],
+            "integer_ranks": bool(self.integer_ranks),
+            "students": [self._plain(student) for student in students],
+            "exam_numbers": [self._plain(exam_no) for exam_no in exam_numbers],
+            "ranks": matrix.tolist(),
+            "present": [bytes(row).decode("ascii") for row in present.astype(np.uint8) + ord("0")],
+        }
+        temp_path = _temp_path(path)
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def is_current(self, filepaths):
+        """已处理过的文件是否都还在列表中且没有被修改"""
+        current = {os.path.abspath(file) for file in filepaths}
+        for file, signature in self.files.items():
+            if file not in current:
+                return False
+            try:
+                if DatasetCache.signature(file) != signature:
+                    return False
+            except OSError:
+                return False
+        return True
 
-            student_ranks = {exam_no: exam_data[student][exam_no] for exam_no in all_exam_numbers if exam_no in exam_data[student]}
-            sorted_ranks = sorted(student_ranks.items())
+class ProgressCalculator:
+    """生成进退步系数报表"""
+    # 各阶段在总进度中所占的权重，按实测耗时估计
+    PHASE_WEIGHTS = {"read": 6, "validate": 0.5, "compute": 0.5, "write": 3}
+    # 只读取计算所需的列
+    READ_COLUMNS = REQUIRED_COLUMNS
 
-            if len(sorted_ranks) < 2:
-                queue.put(("info", f"学生 {student} 在最近的 2 次考试中仅参加了 {len(sorted_ranks)} 次，将跳过计算"))
-                continue
+    @staticmethod
+    def build_rank_matrix(frames):
+        """
+        构建 学生 × 考试 的排名矩阵，每个文件视为一次考试，考试编号取文件中最大的考试编号
+        返回 (按首次出现顺序的学生姓名, 升序的考试编号, 排名矩阵, 是否参加考试的掩码)
+        同一学生在同一次考试中出现多次时以最后一行为准
+        """
+        file_exam_numbers = [df['考试编号'].max() for df in frames]  # 获取最大考试编号
+        exam_numbers = sorted(set(file_exam_numbers))
+        if not frames:
+            return np.array([], dtype=object), exam_numbers, np.empty((0, 0)), np.empty((0, 0), dtype=bool)
+
+        exam_index = {exam_no: idx for idx, exam_no in enumerate(exam_numbers)}
+        exam_codes = np.repeat([exam_index[exam_no] for exam_no in file_exam_numbers], [len(df) for df in frames])
+        names = pd.concat([df['姓名'] for df in frames], ignore_index=True)
+        ranks = pd.to_numeric(pd.concat([df['级名'] for df in frames], ignore_index=True), errors='coerce')
+        student_codes, students = pd.factorize(names)
+
+        # 忽略姓名为空的行
+        valid = student_codes >= 0
+        matrix = np.full((len(students), len(exam_numbers)), np.nan)
+        present = np.zeros(matrix.shape, dtype=bool)
+        matrix[student_codes[valid], exam_codes[valid]] = ranks.to_numpy(dtype=float)[valid]
+        present[student_codes[valid], exam_codes[valid]] = True
+        return np.asarray(students, dtype=object), exam_numbers, matrix, present
 
-            progress_entry = {'学生姓名': student}
-            for exam_no, rank in sorted_ranks:
-                progress_entry[f'第{exam_no}次考试排名'] = rank
+    @staticmethod
+    def merge_rank_matrices(base, update):
+        """
+        将新一批考试的排名矩阵合并到已有矩阵后面，参数和返回值均为 build_rank_matrix 的结果
+        已有学生保持原顺序，新学生按首次出现顺序追加在后面
+        """
+        base_students, base_exams, base_matrix, base_present = base
+        new_students, new_exams, new_matrix, new_present = update
+        student_index = {student: idx for idx, student in enumerate(base_students)}
+        added = [student for student in new_students if student not in student_index]
+        for student in added:
+            student_index[student] = len(student_index)
+        students = np.concatenate([np.asarray(base_students, dtype=object), np.array(added, dtype=object)])
+        exam_numbers = sorted(set(base_exams) | set(new_exams))
+        exam_index = {exam_no: idx for idx, exam_no in enumerate(exam_numbers)}
+
+        matrix = np.full((len(students), len(exam_numbers)), np.nan)
+        present = np.zeros(matrix.shape, dtype=bool)
+        cells = np.ix_(np.arange(len(base_students)), [exam_index[exam_no] for exam_no in base_exams])
+        matrix[cells] = base_matrix
+        present[cells] = base_present
+        cells = np.ix_([student_index[student] for student in new_students], [exam_index[exam_no] for exam_no in new_exams])
+        matrix[cells] = np.where(new_present, new_matrix, matrix[cells])
+        present[cells] |= new_present
+        return students, exam_numbers, matrix, present
 
-            last_exam_rank = sorted_ranks[-2][1]
-            current_exam_rank = sorted_ranks[-1][1]
+    @staticmethod
+    def progress_table(rank_matrix, integer_ranks, queue):
+        """根据排名矩阵计算进退步系数报表，integer_ranks 表示排名是否全部为整数"""
+        students, exam_numbers, matrix, present = rank_matrix
+
+        # 跳过的学生合并为一条警告，避免逐个提示
+        attended = present.sum(axis=1)
+        skipped = students[attended < 2]
+        if len(skipped):
+            queue.put(("warning", f"以下 {len(skipped)} 位学生仅参加了 1 次考试，已跳过计算："
+                                  f"{'、'.join(map(str, skipped))}"))
+
+        keep = attended >= 2
+        students, matrix, present = students[keep], matrix[keep], present[keep]
+        if not len(students):
+            return pd.DataFrame()
+
+        # 每行最后一个和倒数第二个参加的考试所在的列
+        rows = np.arange(len(students))
+        exam_count = len(exam_numbers)
+        current_col = exam_count - 1 - np.argmax(present[:, ::-1], axis=1)
+        earlier = present.copy()
+        earlier[rows, current_col] = False
+        last_col = exam_count - 1 - np.argmax(earlier[:, ::-1], axis=1)
+
+        last_exam_rank = matrix[rows, last_col]
+        current_exam_rank = matrix[rows, current_col]
+        with np.errstate(divide='ignore', invalid='ignore'):
             progress_coefficient = (last_exam_rank - current_exam_rank) / last_exam_rank
-            progress_entry['进退步系数'] = progress_coefficient
-            progress_data.append(progress_entry)
 
-        # 询问保存
-        save_directory = filedialog.askdirectory(title="选择保存目录")
-        if not save_directory:
+        # 列顺序与逐行构建字典时一致：先是第一位学生参加的考试（升序）和进退步系数，
+        # 其余考试按首次有成绩的学生顺序排在后面
+        first_row = np.where(present.any(axis=0), np.argmax(present, axis=0), len(students))
+        order = sorted((first_row[col], col) for col in range(exam_count) if first_row[col] < len(students))
+
+        columns = {'学生姓名': students}
+        coefficient_placed = False
+        for row, col in order:
+            if row > 0 and not coefficient_placed:
+                columns['进退步系数'] = progress_coefficient
+                coefficient_placed = True
+            values = np.where(present[:, col], matrix[:, col], np.nan)
+            if integer_ranks and not np.isnan(values).any():
+                values = values.astype(np.int64)
+            columns[f'第{exam_numbers[col]}次考试排名'] = values
+        if not coefficient_placed:
+            columns['进退步系数'] = progress_coefficient
+        return pd.DataFrame(columns)
+    
+    @staticmethod
+    def calculate_progress(filepaths, save_directory, is_canceled_callback, queue, streaming=False, incremental=False):
+        """
+        生成进退步系数报表
+        incremental 为 True 时在输出目录中保存排名矩阵，下次只读取新增的文件；
+        已处理过的文件被修改或移除时重新计算全部考试
+        """
+        state_file = os.path.join(save_directory, PROGRESS_STATE_FILE)
+        state = ProgressState.load(state_file) if incremental else None
+        if state is not None and not state.is_current(filepaths):
+            queue.put(("log", "已处理过的文件被修改或移除，重新计算全部考试"))
+            state = None
+        new_files = [file for file in filepaths if state is None or os.path.abspath(file) not in state.files]
+
+        # 在读取前记录文件状态，读取期间被修改的文件下次会触发重新计算
+        signatures = {}
+        if incremental:
+            for file in new_files:
+                try:
+                    signatures[os.path.abspath(file)] = DatasetCache.signature(file)
+                except OSError as e:
+                    queue.put(("error", f"无法读取文件 {os.path.basename(file)}: {str(e)}"))
+                    return None
+
+        phases = ProgressPhases(queue, ProgressCalculator.PHASE_WEIGHTS)
+        frames = DataProcessor.load_files(new_files, REQUIRED_COLUMNS, is_canceled_callback, queue, phases=phases,
+                                          columns=ProgressCalculator.READ_COLUMNS)
+        if frames is None:
+            return None
+
+        if is_canceled_callback():
             queue.put(("info", "操作已取消"))
-            return
+            return None
+
+        # 新文件的考试编号不能与已处理的文件重复
+        exam_values = set(state.exam_values) if state is not None else set()
+        if incremental:
+            for df in frames:
+                duplicate_exam_numbers = DataProcessor.check_duplicate_exam_numbers(set(df['考试编号']), exam_values, queue)
+                if duplicate_exam_numbers:
+                    queue.put(("error", f"发现重复的考试编号: {', '.join(map(str, duplicate_exam_numbers))}"))
+                    return None
+
+        # 计算进退步系数
+        computer = phases.phase("compute", 1)
+        rank_matrix = ProgressCalculator.build_rank_matrix(frames)
+        integer_ranks = all(pd.api.types.is_integer_dtype(df['级名']) for df in frames)
+        if state is not None:
+            rank_matrix = ProgressCalculator.merge_rank_matrices(state.rank_matrix, rank_matrix)
+            integer_ranks = integer_ranks and state.integer_ranks
+            queue.put(("log", f"增量计算：读取 {len(new_files)} 个新文件，复用 {len(state.files)} 个已处理的文件"))
+        queue.put(("stats", {"students": len(rank_matrix[0])}))
+        progress_df = ProgressCalculator.progress_table(rank_matrix, integer_ranks, queue)
+        computer.advance()
 
         # 输出文件
         output_file = os.path.join(save_directory, "进退步系数.xlsx")
+        writer = phases.phase("write", 1)
         try:
-            pd.DataFrame(progress_data).to_excel(output_file, index=False)
+            DataProcessor.write_excel(progress_df, output_file, streaming)
+            writer.advance()
+            phases.finish()
             queue.put(("info", f"进退步系数报表已保存至 {output_file}"))
         except PermissionError:
             queue.put(("error", f"无法保存文件，因为文件 {output_file} 已被占用或打开。"))
+            return None
+
+        if incremental:
+            files = dict(state.files) if state is not None else {}
+            files.update(signatures)
+            try:
+                ProgressState(files, exam_values, rank_matrix, integer_ranks).save(state_file)
+            except OSError as e:
+                queue.put(("warning", f"无法保存增量计算状态: {str(e)}"))
+
+def _setup_chart_font():
+    """设置matplotlib中文支持（创建 RankingChartTemplate 时调用，子进程中同样生效）"""
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 设置中文字体为 SimHei（黑体）
+    matplotlib.rcParams['axes.unicode_minus'] = False    # 防止负号显示为方块
+
+def _render_ranking_charts(tasks, dpi):
+    """
+    绘制一组学生的折线图（可在子进程中运行）
+    tasks 为 [(姓名, 考试编号列表, 排名列表, 输出文件), ...]，返回 [(姓名, 错误信息), ...]
+    """
+    template = RankingChartTemplate(dpi)
+    results = []
+    for student, exam_numbers, ranks, output_file in tasks:
+        try:
+            template.update(student, exam_numbers, ranks)
+            template.save(output_file)
+            results.append((student, None))
+        except Exception as e:
+            results.append((student, str(e)))
+    return results
+
+class RankingChartTemplate:
+    """
+    可复用的年级排名折线图模板
+    使用面向对象的 Figure 接口，坐标轴、标签、图例和网格只创建一次，每位学生只更新折线数据、刻度和标题
+    """
+    def __init__(self, dpi=CHART_DPI):
+        from matplotlib.figure import Figure
+
+        _setup_chart_font()
+        self.dpi = dpi
+        self.fig = Figure()
+        self.ax = self.fig.add_subplot()
+        self.line, = self.ax.plot([], [], marker='o')
+        self.title = self.ax.set_title('')
+        self.ax.set_xlabel('考试编号')
+        self.ax.set_ylabel('年级排名')
+        self.ax.invert_yaxis()  # 翻转 Y 轴
+        self.legend = self.ax.legend([self.line], [''])
+        self.ax.grid()
+
+    def update(self, student, exam_numbers, ranks):
+        """替换为指定学生的数据，返回 Figure"""
+        self.line.set_data(exam_numbers, ranks)
+        self.line.set_label(student)
+        self.legend.get_texts()[0].set_text(student)
+        self.title.set_text(f'{student} 年级排名折线图')
+        # 设置 x 轴刻度为整数
+        self.ax.set_xticks([int(exam_no) for exam_no in exam_numbers])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return self.fig
+
+    def save(self, output_file):
+        """根据文件扩展名自动选择 Agg 或 PDF 后端保存"""
+        self.fig.savefig(output_file, dpi=self.dpi)
 
 class RankingChartGenerator:
     """生成年级排名折线图"""
-    
-    @staticmethod
-    def generate_ranking_charts(filepaths, save_directory, is_canceled_callback, queue, file_format='pdf'):
-        # 设置matplotlib中文支持
-        matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 设置中文字体为 SimHei（黑体）
-        matplotlib.rcParams['axes.unicode_minus'] = False    # 防止负号显示为方块
-        combined_df = pd.DataFrame()
-        all_exam_numbers = set()
+    # 各阶段在总进度中所占的权重，按实测耗时估计（绘图占绝大部分时间）
+    PHASE_WEIGHTS = {"read": 3, "validate": 0.2, "merge": 0.3, "compute": 0.5, "write": 16}
+    # 只读取绘图所需的列，按班级输出时还需要“班级”列
+    READ_COLUMNS = REQUIRED_COLUMNS + [CLASS_COLUMN]
 
-        for file in filepaths:
-            if is_canceled_callback():
-                queue.put(("info", "操作已取消"))
-                return
-
-            df = DataProcessor.read_excel(file, queue)
-            if df is None:
-                return None
-
-            if not DataProcessor.validate_data(df, ['考试编号', '姓名', '级名'], queue):
-                return None
-
-            current_exam_numbers = set(df['考试编号'])
-            duplicate_exam_numbers = DataProcessor.check_duplicate_exam_numbers(current_exam_numbers, all_exam_numbers, queue)
-            if duplicate_exam_numbers:
-                queue.put(("error", f"发现重复的考试编号: {', '.join(map(str, duplicate_exam_numbers))}"))
-                return None
+    @staticmethod
+    def load_history(filepaths, is_canceled_callback, queue, phases=None):
+        """读取并合并绘图所需的列，返回 ExamHistory，出错或取消时返回 None（界面中预览单个学生时也使用）"""
+        frames = DataProcessor.load_files(filepaths, REQUIRED_COLUMNS, is_canceled_callback, queue, phases=phases,
+                                          columns=RankingChartGenerator.READ_COLUMNS)
+        if frames is None:
+            return None
 
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
+        merger = phases.phase("merge", 1) if phases is not None else None
+        history = ExamHistory.build(frames, queue)
+        if merger is not None:
+            merger.advance()
+        return history
 
-        if combined_df.empty:
+    @staticmethod
+    def generate_ranking_charts(filepaths, save_directory, is_canceled_callback, queue, file_format='pdf', workers=1,
+                                output_mode='separate', dpi=CHART_DPI, incremental=False):
+        """
+        output_mode: 'separate' 每位学生一个文件；'combined' 所有学生合并为一个多页 PDF；
+        'per_class' 每个班级一个多页 PDF（需要“班级”列）
+        dpi: 输出分辨率，预览时可使用 CHART_PREVIEW_DPI
+        incremental: 为 True 时跳过数据和选项都没有变化的输出文件
+        """
+        phases = ProgressPhases(queue, RankingChartGenerator.PHASE_WEIGHTS)
+        history = RankingChartGenerator.load_history(filepaths, is_canceled_callback, queue, phases)
+        if history is None:
+            return None
+        if history.empty:
             queue.put(("warning", "没有有效的数据生成折线图"))
             return
 
-        students = combined_df['姓名'].unique()
-        for idx, student in enumerate(students):
+        if output_mode == 'per_class' and CLASS_COLUMN not in history.df.columns:
+            queue.put(("warning", f"数据中没有“{CLASS_COLUMN}”列，所有学生将合并输出到同一个 PDF"))
+            output_mode = 'combined'
+
+        # 每个输出文件的指纹由输出选项和其中所有学生的数据决定
+        manifest = OutputManifest.load(os.path.join(save_directory, CHART_MANIFEST_FILE)) if incremental else None
+        if manifest is not None:
+            row_hashes = history.row_hashes(REQUIRED_COLUMNS)
+            options = {"format": file_format, "mode": output_mode, "dpi": dpi}
+            fingerprints = {}
+
+        # 每位学生的排名直接从学生索引的排名矩阵中取，不再切分合并数据
+        store = history.store
+        class_names = store.last_values(CLASS_COLUMN) if output_mode == 'per_class' else None
+        computer = phases.phase("compute", len(store))
+        tasks = []
+        for student_id, student in enumerate(store.students):
             if is_canceled_callback():
                 queue.put(("info", "操作已取消"))
                 return
+            if output_mode == 'separate':
+                # 根据用户选择的文件格式保存文件
+                output_file = os.path.join(save_directory, f'{student}_年级排名折线图.{file_format}')
+            elif output_mode == 'per_class':
+                class_name = DataProcessor.format_class_name(class_names[student_id])
+                output_file = os.path.join(save_directory, f'{class_name}_年级排名折线图.pdf')
+            else:
+                output_file = os.path.join(save_directory, '年级排名折线图.pdf')
+            exam_numbers, ranks = store.history(student_id)
+            tasks.append((student, exam_numbers.tolist(), ranks.tolist(), output_file))
+            if manifest is not None:
+                if output_file not in fingerprints:
+                    fingerprints[output_file] = OutputManifest.new_fingerprint(options)
+                fingerprints[output_file].update(row_hashes[store.row_positions(student_id)].tobytes())
+            computer.advance()
+
+        written = []
+        if manifest is not None:
+            fingerprints = {output_file: digest.hexdigest() for output_file, digest in fingerprints.items()}
+            unchanged = {output_file for output_file, fingerprint in fingerprints.items()
+                         if manifest.is_current(output_file, fingerprint)}
+            if unchanged:
+                tasks = [task for task in tasks if task[3] not in unchanged]
+                queue.put(("log", f"跳过 {len(unchanged)} 个未变化的文件"))
+
+        progress = phases.phase("write", len(tasks))
+        if not tasks:
+            completed = True
+        elif output_mode != 'separate':
+            completed = RankingChartGenerator._render_multipage(tasks, dpi, is_canceled_callback, queue, written,
+                                                                progress)
+        elif workers > 1 and len(tasks) > CHART_CHUNK_SIZE:
+            completed = RankingChartGenerator._render_parallel(tasks, dpi, workers, is_canceled_callback, queue,
+                                                               written, progress)
+        else:
+            completed = RankingChartGenerator._render_serial(tasks, dpi, is_canceled_callback, queue, written,
+                                                             progress)
+
+        if manifest is not None:
+            for output_file in written:
+                manifest.record(output_file, fingerprints[output_file])
+            manifest.save_or_warn(queue)
+        if not completed:
+            queue.put(("info", "操作已取消"))
+            return
 
-            # 确保数据按照考试编号排序（全局排序）
-            combined_df['考试编号'] = pd.to_numeric(combined_df['考试编号'], errors='coerce')
-            combined_df = combined_df.dropna(subset=['考试编号'])  # 删除无效考试编号的行
-            combined_df = combined_df.sort_values(by='考试编号')
+        phases.finish()
+        queue.put(("info", "年级排名折线图已生成"))
 
-            student_data = combined_df[combined_df['姓名'] == student]
+    @staticmethod
+    def _render_serial(tasks, dpi, is_canceled_callback, queue, written, progress):
+        """在当前线程逐个绘制，成功写出的文件追加到 written，取消时返回 False"""
+        template = RankingChartTemplate(dpi)
+        for student, exam_numbers, ranks, output_file in tasks:
+            if is_canceled_callback():
+                return False
             try:
-                plt.figure()
-                plt.plot(student_data['考试编号'], student_data['级名'], marker='o', label=student)
-                plt.title(f'{student} 年级排名折线图')
-                plt.xlabel('考试编号')
-                plt.ylabel('年级排名')
-                # 设置 x 轴刻度为整数
-                x_ticks = student_data['考试编号'].astype(int)  # 取整数部分
-                plt.xticks(x_ticks)  # 设置 x 轴的刻度为整数
-                plt.gca().invert_yaxis()  # 翻转 Y 轴
-                plt.legend()
-                plt.grid()
-                
-                # 根据用户选择的文件格式保存文件
-                output_file = os.path.join(save_directory, f'{student}_年级排名折线图.{file_format}')
-                plt.savefig(output_file, dpi=300)  # 将 dpi 设置为 300
-                plt.close()
-                queue.put(("progress", (idx + 1) / len(students)))
+                template.update(student, exam_numbers, ranks)
+                template.save(output_file)
+                written.append(output_file)
             except Exception as e:
                 queue.put(("error", f"生成学生 {student} 的图表时出现错误: {e}"))
+            progress.advance()
+        return True
 
-        queue.put(("progress", 1.0))
-        queue.put(("info", "年级排名折线图已生成"))
+    @staticmethod
+    def _render_multipage(tasks, dpi, is_canceled_callback, queue, written, progress):
+        """
+        按输出文件分组，使用 PdfPages 逐页流式写入多页 PDF，字体在每个文件中只嵌入一次
+        所有页面都成功的文件追加到 written，取消时返回 False
+        """
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        pages = {}
+        for task in tasks:
+            pages.setdefault(task[3], []).append(task)
+
+        template = RankingChartTemplate(dpi)
+        for output_file, file_tasks in pages.items():
+            file_start = progress.done
+            succeeded = True
+            try:
+                with PdfPages(output_file) as pdf:
+                    for student, exam_numbers, ranks, _ in file_tasks:
+                        if is_canceled_callback():
+                            return False
+                        try:
+                            pdf.savefig(template.update(student, exam_numbers, ranks), dpi=dpi)
+                        except Exception as e:
+                            succeeded = False
+                            queue.put(("error", f"生成学生 {student} 的图表时出现错误: {e}"))
+                        progress.advance()
+                if succeeded:
+                    written.append(output_file)
+            except PermissionError:
+                queue.put(("error", f"无法保存文件，因为文件 {output_file} 已被占用或打开。"))
+                progress.update(file_start + len(file_tasks))
+        return True
+
+    @staticmethod
+    def _render_parallel(tasks, dpi, workers, is_canceled_callback, queue, written, progress):
+        """按块分发到进程池绘制，完成一块即汇报一次进度，成功写出的文件追加到 written，取消时返回 False"""
+        def on_result(chunk, results):
+            if isinstance(results, Exception):
+                queue.put(("error", f"生成图表时出现错误: {results}"))
+            else:
+                for task, (student, error) in zip(chunk, results):
+                    if error is not None:
+                        queue.put(("error", f"生成学生 {student} 的图表时出现错误: {error}"))
+                    else:
+                        written.append(task[3])
+            progress.advance(len(chunk))
+
+        chunks = list(_chunked(tasks, CHART_CHUNK_SIZE))
+        return run_in_process_pool(_render_ranking_charts, chunks, (dpi,), min(workers, len(chunks)),
+                                   is_canceled_callback, on_result, initializer=_setup_chart_font)
+
+def _plain_rows(df):
+    """
+    将分类类型的列（如合并时转换的姓名）转为普通的 object 列
+    分类列的切片仍带有完整的类别列表，直接交给子进程时每位学生都要序列化所有学生的姓名
+    """
+    categorical = df.select_dtypes("category").columns
+    return df.astype({column: object for column in categorical}) if len(categorical) else df
+
+def _write_report_cards(tasks, streaming):
+    """
+    写出一组学生的成绩单（可在子进程中运行）
+    tasks 为 [(成绩数据, 输出文件), ...]，返回写入失败的 [(输出文件, 错误信息)]，文件被占用时错误信息为 None
+    """
+    failures = []
+    for student_data, output_file in tasks:
+        try:
+            # 包含所有列
+            DataProcessor.write_excel(student_data, output_file, streaming)
+        except PermissionError:
+            failures.append((output_file, None))
+        except Exception as e:
+            failures.append((output_file, str(e)))
+    return failures
 
 class HistoricalReportGenerator:
     """生成历次考试成绩单"""
+    # 各阶段在总进度中所占的权重，按实测耗时估计
+    PHASE_WEIGHTS = {"read": 3, "validate": 0.2, "merge": 0.3, "compute": 0.5, "write": 6}
+    # 成绩单包含所有列，读取完整的文件
+    READ_COLUMNS = None
     
     @staticmethod
-    def generate_report(filepaths, save_directory, is_canceled_callback, queue):
-        combined_df = pd.DataFrame()
-        all_exam_numbers = set()
+    def generate_report(filepaths, save_directory, is_canceled_callback, queue, streaming=False,
+                        output_mode='separate', workers=1, incremental=False):
+        """
+        output_mode: 'separate' 每位学生一个文件；'workbook' 所有学生作为工作表写入同一个文件；
+        'per_class' 每个班级一个文件（需要“班级”列）
+        workers: 每位学生一个文件时，大于 1 则使用进程池并行写出
+        incremental: 为 True 时跳过数据和选项都没有变化的输出文件
+        """
+        phases = ProgressPhases(queue, HistoricalReportGenerator.PHASE_WEIGHTS)
+        frames = DataProcessor.load_files(filepaths, REQUIRED_COLUMNS, is_canceled_callback, queue, phases=phases,
+                                          columns=HistoricalReportGenerator.READ_COLUMNS)
+        if frames is None:
+            return None
 
         # 合并数据
-        for file in filepaths:
-            if is_canceled_callback():
-                queue.put(("info", "操作已取消"))
-                return
-
-            df = DataProcessor.read_excel(file, queue)
-            if df is None:
-                return None
-
-            if not DataProcessor.validate_data(df, ['考试编号', '姓名', '级名'], queue):
-                return None
-
-            current_exam_numbers = set(df['考试编号'])
-            duplicate_exam_numbers = DataProcessor.check_duplicate_exam_numbers(current_exam_numbers, all_exam_numbers, queue)
-            if duplicate_exam_numbers:
-                queue.put(("error", f"发现重复的考试编号: {', '.join(map(str, duplicate_exam_numbers))}"))
-                return None
-
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
-
-        if combined_df.empty:
+        merger = phases.phase("merge", 1)
+        history = ExamHistory.build(frames, queue)
+        merger.advance()
+        if history.empty:
             queue.put(("warning", "没有有效的数据生成成绩单"))
             return
 
-        # 按学生分类
-        students = combined_df['姓名'].unique()
-
-        # 生成报表
-        for idx, student in enumerate(students):
-            if is_canceled_callback():
+        if output_mode == 'per_class' and CLASS_COLUMN not in history.df.columns:
+            queue.put(("warning", f"数据中没有“{CLASS_COLUMN}”列，所有成绩单将写入同一个文件"))
+            output_mode = 'workbook'
+
+        # 成绩单包含所有列，指纹由输出选项、列名和学生的全部数据决定
+        computer = phases.phase("compute", 1)
+        manifest = OutputManifest.load(os.path.join(save_directory, REPORT_MANIFEST_FILE)) if incremental else None
+        if manifest is not None:
+            row_hashes = history.row_hashes()
+            options = {"mode": output_mode, "streaming": streaming, "columns": [str(c) for c in history.df.columns]}
+
+        if output_mode != 'separate':
+            skip = set()
+            if manifest is not None:
+                fingerprints = {}
+                for student, student_data in history.iter_students():
+                    output_file = HistoricalReportGenerator._workbook_file(student_data, save_directory, output_mode)
+                    if output_file not in fingerprints:
+                        fingerprints[output_file] = OutputManifest.new_fingerprint(options)
+                    fingerprints[output_file].update(row_hashes[student_data.index.to_numpy()].tobytes())
+                fingerprints = {output_file: digest.hexdigest() for output_file, digest in fingerprints.items()}
+                skip = {output_file for output_file, fingerprint in fingerprints.items()
+                        if manifest.is_current(output_file, fingerprint)}
+                if skip:
+                    queue.put(("log", f"跳过 {len(skip)} 个未变化的文件"))
+            computer.advance()
+
+            progress = phases.phase("write", history.student_count)
+            completed, written = HistoricalReportGenerator._write_workbooks(history, save_directory, output_mode,
+                                                                            is_canceled_callback, queue, progress, skip)
+            if manifest is not None:
+                for output_file in written:
+                    manifest.record(output_file, fingerprints[output_file])
+                manifest.save_or_warn(queue)
+            if not completed:
                 queue.put(("info", "操作已取消"))
                 return
+            phases.finish()
+            queue.put(("info", "历次考试成绩单已生成"))
+            return
 
-            # 筛选每位学生的成绩
-            student_data = combined_df[combined_df['姓名'] == student]
-            
-            # 进行排序
-            student_data = student_data.sort_values(by='考试编号', ascending=True)
-
-            # 保存文件
-            student_report_path = os.path.join(save_directory, f"{student}_成绩单.xlsx")
-            try:
-                # 包含所有列
-                student_data.to_excel(student_report_path, index=False)
-                queue.put(("progress", (idx + 1) / len(students)))
-            except PermissionError:
-                queue.put(("error", f"无法保存文件，因为文件 {student_report_path} 已被占用或打开。"))
+        # 每位学生一个文件时，指纹在写出前逐个计算
+        computer.advance()
+
+        # 按学生分类，每位学生的成绩已按考试编号排序
+        student_count = history.student_count
+        fingerprints = {}
+        skipped = 0
+
+        def iter_tasks():
+            nonlocal skipped
+            for student, student_data in history.iter_students():
+                output_file = os.path.join(save_directory, f"{student}_成绩单.xlsx")
+                if manifest is not None:
+                    digest = OutputManifest.new_fingerprint(options)
+                    digest.update(row_hashes[student_data.index.to_numpy()].tobytes())
+                    fingerprint = digest.hexdigest()
+                    if manifest.is_current(output_file, fingerprint):
+                        skipped += 1
+                        continue
+                    fingerprints[output_file] = fingerprint
+                yield _plain_rows(student_data), output_file
+
+        # 生成报表，写入失败的文件汇总后统一提示
+        failures = []
+        finished = 0
+        progress = phases.phase("write", student_count)
+
+        def on_result(chunk, result):
+            nonlocal finished
+            if isinstance(result, Exception):
+                failures.extend((output_file, str(result)) for _, output_file in chunk)
+            else:
+                failures.extend(result)
+                if manifest is not None:
+                    failed = {output_file for output_file, _ in result}
+                    for _, output_file in chunk:
+                        if output_file not in failed:
+                            manifest.record(output_file, fingerprints.pop(output_file))
+            finished += len(chunk)
+            progress.update(finished + skipped)
+
+        tasks = iter_tasks()
+
+        if workers > 1 and student_count > REPORT_CHUNK_SIZE:
+            completed = run_in_process_pool(_write_report_cards, _chunked(tasks, REPORT_CHUNK_SIZE), (streaming,),
+                                            workers, is_canceled_callback, on_result)
+        else:
+            completed = True
+            for task in tasks:
+                if is_canceled_callback():
+                    completed = False
+                    break
+                on_result([task], _write_report_cards([task], streaming))
+
+        if manifest is not None:
+            if skipped:
+                queue.put(("log", f"跳过 {skipped} 位未变化的学生"))
+            manifest.save_or_warn(queue)
+        if failures:
+            HistoricalReportGenerator._report_failures(failures, queue)
+        if not completed:
+            queue.put(("info", "操作已取消"))
+            return
 
-        queue.put(("progress", 1.0))
+        phases.finish()
         queue.put(("info", "历次考试成绩单已生成"))
 
-class FileCard(ctk.CTkFrame):
-    def __init__(self, master, filepath, remove_callback=None):
-        super().__init__(master, fg_color=("gray90", "gray13"))
-        self.filepath = filepath
-        self.remove_callback = remove_callback
-        self._create_widgets()
-
-    def _create_widgets(self):
-        # 文件图标
-        self.icon_label = ctk.CTkLabel(self, text="📄", width=30)
-        self.icon_label.pack(side="left", padx=5)
-
-        # 文件名和路径
-        text_frame = ctk.CTkFrame(self, fg_color="transparent")
-        text_frame.pack(side="left", fill="x", expand=True)
-        
-        self.name_label = ctk.CTkLabel(text_frame, text=os.path.basename(self.filepath), 
-                                      font=ctk.CTkFont(weight="bold"))
-        self.name_label.pack(anchor="w")
-        
-        self.path_label = ctk.CTkLabel(text_frame, text=self.filepath, 
-                                      text_color=("gray40", "gray60"), font=ctk.CTkFont(size=12))
-        self.path_label.pack(anchor="w")
-
-        # 删除按钮
-        self.remove_btn = ctk.CTkButton(self, text="×", width=30, height=30, 
-                                      fg_color="transparent", hover_color=("gray80", "gray20"),
-                                      command=self._on_remove)
-        self.remove_btn.pack(side="right", padx=5)
-
-        # 添加悬停效果
-        self.bind("<Enter>", lambda e: self.configure(fg_color=("gray85", "gray15")))
-        self.bind("<Leave>", lambda e: self.configure(fg_color=("gray90", "gray13")))
-
-        # 添加文件类型校验图标
-        file_ext = os.path.splitext(self.filepath)[1].lower()
-        icon = "📊" if file_ext == ".xlsx" else "❓"
-        self.icon_label.configure(text=icon)
-
-    def _on_remove(self):
-        if self.remove_callback:
-            self.remove_callback(self.filepath)
-        self.destroy()
-
-class ExamAnalysisToolGUI:
-    """主页面"""
-    def __init__(self):
-        self.root = ctk.CTk()  # 创建 CTk 窗口
-        self.root.title("考试成绩分析工具")
-        self.root.geometry("800x400")  # 设置窗口默认大小
-        
-        self.file_handler = FileHandler()  # 需要实现 FileHandler 类
-        self.queue = queue.Queue()
-        self.is_canceled = False
-        self.is_on_top = False
-
-        self.file_format_variable = tk.StringVar(value="pdf")  # 单选按钮变量
-
-        self.init_ui()
-        self.setup_menu()  # 初始化菜单栏
-        self.timer = self.root.after(100, self.process_queue)
-        self.progress_bar.set(0)
-
-    def init_ui(self):
-        """初始化 UI"""
-        self.central_widget = ctk.CTkFrame(self.root)
-        self.central_widget.pack(padx=20, pady=20, fill="both", expand=True)
-
-        # 左侧区域
-        left_frame = ctk.CTkFrame(self.central_widget)
-        left_frame.pack(side="left", padx=10, pady=10, fill="both", expand=True)
-
-        self.file_label = ctk.CTkLabel(left_frame, text="已选择的成绩文件：")
-        self.file_label.pack(pady=10)
-
-        self.file_scrollframe = ctk.CTkScrollableFrame(left_frame, width=250, height=200)
-        self.file_scrollframe.pack(padx=10, pady=10, fill="both", expand=True)
-
-        # 右侧区域
-        right_frame = ctk.CTkFrame(self.central_widget)
-        right_frame.pack(side="right", padx=10, pady=10, fill="both", expand=True)
-
-        self.input_file_button = ctk.CTkButton(right_frame, text="选择文件", command=self.load_input_files)
-        self.input_file_button.pack(pady=10)
-
-        self.analyze_button = ctk.CTkButton(right_frame, text="生成进退步系数报表", command=self.start_calculate_progress)
-        self.analyze_button.pack(pady=10)
-
-        self.chart_button = ctk.CTkButton(right_frame, text="生成年级排名折线图", command=self.start_generate_ranking_charts)
-        self.chart_button.pack(pady=10)
-
-        # 添加单选按钮
-        pdf_png_frame = ctk.CTkFrame(right_frame)
-        pdf_png_frame.pack(pady=10)
-
-        self.pdf_radio = ctk.CTkRadioButton(pdf_png_frame, text="输出为 PDF", variable=self.file_format_variable, value="pdf")
-        self.pdf_radio.pack(side="left", padx=10)
-
-        self.png_radio = ctk.CTkRadioButton(pdf_png_frame, text="输出为 PNG", variable=self.file_format_variable, value="png")
-        self.png_radio.pack(side="left", padx=10)
-
-        self.report_button = ctk.CTkButton(right_frame, text="生成历次考试成绩单", command=self.start_generate_report)
-        self.report_button.pack(pady=10)
-
-        self.cancel_button = ctk.CTkButton(right_frame, text="取消", state="disabled", command=self.cancel_operation)
-        self.cancel_button.pack(pady=10)
-
-        self.progress_bar = ctk.CTkProgressBar(right_frame, width=300)
-        self.progress_bar.pack(pady=10)
-
-    def setup_menu(self):
-        """设置菜单栏"""
-        self.root.option_add("*Font", "SimHei 20")  # 设置全局菜单字体
-        menubar = tk.Menu(self.root)
-        help_menu = tk.Menu(menubar, tearoff=0)
-        menubar.add_cascade(label="帮助", menu=help_menu)
+    @staticmethod
+    def _report_failures(failures, queue, limit=10):
+        """将写入失败的文件汇总为一条错误信息"""
+        lines = []
+        for output_file, error in failures[:limit]:
+            reason = "已被占用或打开" if error is None else error
+            lines.append(f"{os.path.basename(output_file)}：{reason}")
+        if len(failures) > limit:
+            lines.append(f"……等共 {len(failures)} 个文件")
+        queue.put(("error", f"以下 {len(failures)} 个成绩单未能保存：\n" + "\n".join(lines)))
 
-        help_menu.add_command(label="关于", command=self.show_about_dialog)
-        help_menu.add_command(label="置顶", command=self.toggle_top)
+    @staticmethod
+    def _workbook_file(student_data, save_directory, output_mode):
+        """学生的成绩单所在的工作簿"""
+        if output_mode == 'per_class':
+            class_name = DataProcessor.format_class_name(student_data[CLASS_COLUMN].iloc[-1])
+            return os.path.join(save_directory, f"{class_name}_历次考试成绩单.xlsx")
+        return os.path.join(save_directory, "历次考试成绩单.xlsx")
 
-        self.root.config(menu=menubar)
+    @staticmethod
+    def _write_workbooks(history, save_directory, output_mode, is_canceled_callback, queue, progress, skip=frozenset()):
+        """
+        在一次遍历中把每位学生的成绩单作为一个工作表流式写入工作簿（按班级时每个班级一个工作簿）
+        跳过 skip 中的工作簿，每处理一位学生通过 progress 汇报一次进度
+        返回 (是否完成, 成功写出的工作簿列表)，取消时已完成的部分仍会写出但不计入列表
+        """
+        workbooks = {}
+        written = []
+        completed = True
+        try:
+            for student, student_data in history.iter_students():
+                if is_canceled_callback():
+                    completed = False
+                    break
+
+                output_file = HistoricalReportGenerator._workbook_file(student_data, save_directory, output_mode)
+                if output_file in skip:
+                    progress.advance()
+                    continue
+                if output_file not in workbooks:
+                    workbooks[output_file] = StreamingWorkbook(output_file)
 
-    def toggle_top(self):
-        """切换窗口置顶状态"""
-        if self.is_on_top:
-            self.root.attributes("-topmost", False)
-            self.is_on_top = False
+                # 包含所有列
+                workbooks[output_file].add_sheet(student_data, student)
+                progress.advance()
+        finally:
+            # 取消时也写出已完成的部分，避免留下损坏的文件
+            for output_file, workbook in workbooks.items():
+                try:
+                    workbook.close()
+                    written.append(output_file)
+                except PermissionError:
+                    queue.put(("error", f"无法保存文件，因为文件 {output_file} 已被占用或打开。"))
+        return completed, (written if completed else [])
+
+def _max_rss(who):
+    """getrusage 的 ru_maxrss（字节），无法获取时返回 None"""
+    resource = _optional_module("resource")
+    if resource is None:
+        return None
+    peak = resource.getrusage(getattr(resource, who)).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+@functools.lru_cache(maxsize=None)
+def _windows_memory_api():
+    """Windows 上返回 (K32GetProcessMemoryInfo, 进程句柄, PROCESS_MEMORY_COUNTERS 类型)，其他平台或失败时返回 None"""
+    if sys.platform != "win32":
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        kernel32 = ctypes.WinDLL("kernel32")
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        get_memory_info = kernel32.K32GetProcessMemoryInfo
+        get_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+        get_memory_info.restype = wintypes.BOOL
+        return get_memory_info, kernel32.GetCurrentProcess(), ProcessMemoryCounters
+    except (ImportError, OSError, AttributeError):
+        return None
+
+def _windows_memory_counters():
+    """未安装 psutil 时在 Windows 上获取当前进程的内存计数，失败时返回 None"""
+    api = _windows_memory_api()
+    if api is None:
+        return None
+    import ctypes
+
+    get_memory_info, process, counters_type = api
+    counters = counters_type()
+    counters.cb = ctypes.sizeof(counters)
+    return counters if get_memory_info(process, ctypes.byref(counters), counters.cb) else None
+
+def lifetime_peak_memory():
+    """当前进程启动以来的峰值内存（字节），无法获取时返回 None；子进程的内存不计算在内"""
+    peak = _max_rss("RUSAGE_SELF")
+    if peak is None:
+        psutil = _optional_module("psutil")
+        if psutil is not None:
+            info = psutil.Process().memory_info()
+            peak = getattr(info, "peak_wset", info.rss)
         else:
-            self.root.attributes("-topmost", True)
-            self.is_on_top = True
-
-    def show_about_dialog(self):
-        """显示关于对话框"""
-        about_message = """\
-        考试成绩分析工具
-        版本：1.4.1
-        作者: fengyec2
-        许可证：GPL-3.0 license
-        项目地址：github.com/fengyec2/ExamAnalysisTool
-        """
-        messagebox.showinfo("关于", about_message)
-
-    def load_input_files(self):
-        """文件选择并更新列表"""
-        filepaths = filedialog.askopenfilenames(filetypes=[("Excel files", "*.xlsx")])
-        self._add_files(filepaths)
-
-    def _add_files(self, filepaths):
-        """统一添加文件方法"""
-        for fp in filepaths:
-            if fp not in self.file_handler.filepaths:
-                self.file_handler.filepaths.append(fp)
-                card = FileCard(
-                    self.file_scrollframe, 
-                    fp, 
-                    remove_callback=self._remove_file
-                )
-                card.pack(fill="x", pady=2)
-
-    def _remove_file(self, filepath):
-        """删除文件回调"""
-        if filepath in self.file_handler.filepaths:
-            self.file_handler.filepaths.remove(filepath)
-
-    def start_calculate_progress(self):
-        """独立线程处理"""
-        self.is_canceled = False
-        self.progress_bar.set(0)
-        self.queue.queue.clear()
-        self.disable_buttons()
-        threading.Thread(target=self.calculate_progress_thread).start()
-
-    def calculate_progress_thread(self):
-        """计算进退步系数"""
-        ProgressCalculator.calculate_progress(self.file_handler.filepaths, lambda: self.is_canceled, self.queue)
-        self.enable_buttons()
-
-    def start_generate_ranking_charts(self):
-        """独立线程处理"""
-        save_directory = filedialog.askdirectory(title="选择 PDF/PNG 保存目录")
-        if not save_directory:
+            counters = _windows_memory_counters()
+            peak = counters.PeakWorkingSetSize if counters is not None else None
+    return peak
+
+def process_memory():
+    """
+    返回 (当前进程的常驻内存, 所有子进程的常驻内存之和)（字节），无法获取的项为 None
+    子进程的内存需要安装 psutil；未安装时 Linux 上读取 /proc、Windows 上调用 GetProcessMemoryInfo 获取当前进程的内存
+    """
+    psutil = _optional_module("psutil")
+    if psutil is not None:
+        try:
+            process = psutil.Process()
+            children = 0
+            for child in process.children(recursive=True):
+                try:
+                    children += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            return process.memory_info().rss, children
+        except psutil.Error:
+            return None, None
+    counters = _windows_memory_counters()
+    if counters is not None:
+        return counters.WorkingSetSize, None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"), None
+    except (OSError, ValueError, AttributeError):
+        return None, None
+
+class MemorySampler:
+    """
+    在后台线程中每隔 interval 秒采样一次内存，记录一次任务运行期间本进程和子进程的峰值
+    已结束的子进程另用 RUSAGE_CHILDREN 补充，只有在本次运行期间增大时才计入
+    图形界面中同时运行的任务共用一个进程，峰值包含同时运行的其他任务
+    """
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = None
+        self.children_peak = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._children_before = None
+
+    def _sample(self):
+        current, children = process_memory()
+        if current is not None:
+            self.peak = max(self.peak or 0, current)
+        if children:
+            self.children_peak = max(self.children_peak or 0, children)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._children_before = _max_rss("RUSAGE_CHILDREN")
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="MemorySampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+        children_after = _max_rss("RUSAGE_CHILDREN")
+        if children_after is not None and self._children_before is not None and children_after > self._children_before:
+            self.children_peak = max(self.children_peak or 0, children_after)
+
+class RunRecorder:
+    """
+    记录一次任务的性能数据：各阶段耗时、处理的行数和学生数、每秒处理量和运行期间的峰值内存
+    作为任务的 queue 使用，阶段耗时（"timing"）和统计（"stats"）消息由本对象记录，其余消息原样转发；
+    任务结束后在日志中输出一行摘要，并在 log_directory 中写入 JSON 文件，profile 为 True 时同时保存 cProfile 结果
+    """
+    _counter = itertools.count(1)
+
+    def __init__(self, name, queue, profile=False, log_directory=LOG_DIRECTORY):
+        self.name = name
+        self.queue = queue
+        self.profile = profile
+        self.log_directory = log_directory
+        self.stages = []
+        self.stats = {}
+        self.errors = 0
+        self.warnings = 0
+        self.memory = None  # 运行期间的 MemorySampler
+
+    def put(self, message):
+        msg_type, msg_content = message
+        if msg_type == "timing":
+            self.stages.append(msg_content)
             return
+        if msg_type == "stats":
+            self.stats.update(msg_content)
+            return
+        if msg_type == "error":
+            self.errors += 1
+        elif msg_type == "warning":
+            self.warnings += 1
+        self.queue.put(message)
+
+    def run(self, func, *args, **kwargs):
+        """调用 func(*args, **kwargs) 并记录性能数据，func 应使用本对象作为 queue；返回 func 的返回值"""
+        profiler = cProfile.Profile() if self.profile else None
+        started_at = time.time()
+        start = time.perf_counter()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # 其他任务正在进行性能分析（Python 3.12 起同时只能有一个）
+                profiler = None
+                self.queue.put(("warning", "已有任务正在进行性能分析，本次不记录 cProfile 结果"))
+        self.memory = MemorySampler()
+        self.memory.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.memory.stop()
+            self.finish(started_at, time.perf_counter() - start, profiler)
+
+    def record(self, started_at, seconds, profile_file=None, profile_top=None):
+        """汇总为可写入 JSON 的字典"""
+        def per_second(count, elapsed):
+            return count / elapsed if count is not None and elapsed > 0 else None
+
+        rows = self.stats.get("rows")
+        students = self.stats.get("students")
+        return {
+            "name": self.name,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started_at)),
+            "seconds": seconds,
+            "stages": [{"phase": stage["phase"], "seconds": stage["seconds"], "items": stage["items"],
+                        "items_per_second": per_second(stage["items"], stage["seconds"])} for stage in self.stages],
+            "rows": rows,
+            "students": students,
+            "rows_per_second": per_second(rows, seconds),
+            "students_per_second": per_second(students, seconds),
+            # 本次运行期间本进程和进程池子进程的峰值，以及进程启动以来的峰值
+            "peak_memory": self.memory.peak if self.memory is not None else None,
+            "children_peak_memory": self.memory.children_peak if self.memory is not None else None,
+            "lifetime_peak_memory": lifetime_peak_memory(),
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "profile_file": profile_file,
+            "profile_top": profile_top,
+            "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpu_count": os.cpu_count()},
+        }
 
-        file_format = self.file_format_variable.get()
+    @staticmethod
+    def summary_text(record):
+        """一行性能摘要"""
+        text = f"性能：共 {record['seconds']:.2f} 秒"
+        if record["stages"]:
+            text += "（" + "，".join(f"{PHASE_LABELS.get(stage['phase'], stage['phase'])} {stage['seconds']:.2f} 秒"
+                                    for stage in record["stages"]) + "）"
+        if record["rows_per_second"] is not None:
+            text += f"；{record['rows']} 行，每秒 {record['rows_per_second']:,.0f} 行"
+        if record["students_per_second"] is not None:
+            text += f"；{record['students']} 位学生，每秒 {record['students_per_second']:,.1f} 位"
+        if record["peak_memory"] is not None:
+            text += f"；峰值内存 {record['peak_memory'] / 1024 / 1024:.0f} MB"
+            if record["children_peak_memory"] is not None:
+                text += f"（子进程 {record['children_peak_memory'] / 1024 / 1024:.0f} MB）"
+        return text
 
-        self.is_canceled = False
-        self.progress_bar.set(0)
-        self.queue.queue.clear()
-        self.disable_buttons()
-        threading.Thread(target=self.generate_ranking_charts_thread, args=(save_directory, file_format)).start()
+    @staticmethod
+    def profile_summary(profiler, limit=PROFILE_TOP_FUNCTIONS):
+        """按累计耗时取前 limit 个函数"""
+        profiler.create_stats()
+        entries = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in profiler.stats.items():
+            entries.append({"function": f"{os.path.basename(filename)}:{line}({function})", "calls": calls,
+                            "total": total, "cumulative": cumulative})
+        entries.sort(key=lambda entry: entry["cumulative"], reverse=True)
+        return entries[:limit]
+
+    def finish(self, started_at, seconds, profiler=None):
+        """写出性能日志并在日志中输出摘要，写入失败时只给出警告"""
+        stem = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started_at))}_{os.getpid()}_{next(self._counter)}"
+        base = os.path.join(self.log_directory, f"{stem}_{self.name}")
+        profile_file = None
+        profile_top = None
+        try:
+            os.makedirs(self.log_directory, exist_ok=True)
+            if profiler is not None:
+                profile_file = base + ".prof"
+                profiler.dump_stats(profile_file)
+                profile_top = self.profile_summary(profiler)
+            record = self.record(started_at, seconds, profile_file, profile_top)
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, indent=2)
+            self.prune_logs(self.log_directory)
+        except OSError as e:
+            record = self.record(started_at, seconds, profile_file, profile_top)
+            self.queue.put(("warning", f"无法写入性能日志: {e}"))
+        text = self.summary_text(record)
+        if profile_file is not None:
+            text += f"；性能分析结果已保存至 {profile_file}"
+        self.queue.put(("log", text))
 
-    def generate_ranking_charts_thread(self, save_directory, file_format):
-        """生成年级排名折线图"""
-        RankingChartGenerator.generate_ranking_charts(
-            self.file_handler.filepaths, save_directory, lambda: self.is_canceled, self.queue, file_format)
-        self.enable_buttons()
+    @staticmethod
+    def prune_logs(log_directory, max_files=LOG_MAX_FILES):
+        """只保留最近的 max_files 个性能日志及其 cProfile 结果"""
+        logs = sorted(name for name in os.listdir(log_directory) if name.endswith(".json"))
+        for name in logs[:-max_files] if len(logs) > max_files else []:
+            for path in (name, name[:-len(".json")] + ".prof"):
+                try:
+                    os.remove(os.path.join(log_directory, path))
+                except OSError:
+                    pass
+
+class CancelToken:
+    """单个任务的取消标记，可以直接作为 is_canceled_callback 传给各个生成方法"""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def __call__(self):
+        return self._event.is_set()
+
+class Job:
+    """调度器中的一个任务，拥有独立的取消标记和消息队列"""
+    PENDING = "等待中"
+    RUNNING = "运行中"
+    FINISHED = "已完成"
+    CANCELED = "已取消"
+    FAILED = "失败"
+
+    def __init__(self, job_id, name, func, args, kwargs, profile=False):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.profile = profile
+        self.token = CancelToken()
+        self.queue = MessageQueue()
+        self.state = Job.PENDING
+        self.future = None
+
+    @property
+    def done(self):
+        return self.state in (Job.FINISHED, Job.CANCELED, Job.FAILED)
+
+    def cancel(self):
+        """取消任务：等待中的任务不再运行，运行中的任务在下一次检查时停止"""
+        self.token.cancel()
+        if self.future is not None and self.future.cancel():
+            self.state = Job.CANCELED
+
+class JobScheduler:
+    """
+    任务调度器：任务在常驻线程池中运行，最多同时运行 max_workers 个，其余按提交顺序排队
+    各任务通过 dataset_cache 共用已解析的文件，折线图和成绩单可以同时生成
+    """
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ExamAnalysisJob")
+        self._lock = threading.Lock()
+        self._jobs = []
+        self._next_id = 1
+
+    def submit(self, name, func, *args, profile=False, **kwargs):
+        """
+        提交任务，运行时调用 func(*args, is_canceled_callback=取消标记, queue=任务的消息队列, **kwargs)
+        任务结束后记录性能日志，profile 为 True 时同时记录 cProfile 结果；返回 Job
+        """
+        with self._lock:
+            job = Job(self._next_id, name, func, args, kwargs, profile)
+            self._next_id += 1
+            self._jobs.append(job)
+        job.future = self._executor.submit(self._run, job)
+        return job
 
-    def start_generate_report(self):
-        """独立线程处理"""
-        save_directory = filedialog.askdirectory(title="选择 Excel 保存目录")
-        if not save_directory:
+    @staticmethod
+    def _run(job):
+        if job.token():
+            job.state = Job.CANCELED
             return
-
-        self.is_canceled = False
-        self.progress_bar.set(0)
-        self.queue.queue.clear()
-        self.disable_buttons()
-        threading.Thread(target=self.generate_report_thread, args=(save_directory,)).start()
-
-    def generate_report_thread(self, save_directory):
-        """生成历次考试成绩单"""
-        HistoricalReportGenerator.generate_report(self.file_handler.filepaths, save_directory, lambda: self.is_canceled, self.queue)
-        self.enable_buttons()
-
-    def cancel_operation(self):
-        """取消操作"""
-        self.is_canceled = True
-
-    def enable_buttons(self):
-        """启用按钮"""
-        self.input_file_button.configure(state="normal")
-        self.analyze_button.configure(state="normal")
-        self.chart_button.configure(state="normal")
-        self.report_button.configure(state="normal")
-        self.cancel_button.configure(state="disabled")
-        self.pdf_radio.configure(state="normal")
-        self.png_radio.configure(state="normal")
-
-    def disable_buttons(self):
-        """禁用按钮"""
-        self.input_file_button.configure(state="disabled")
-        self.analyze_button.configure(state="disabled")
-        self.chart_button.configure(state="disabled")
-        self.report_button.configure(state="disabled")
-        self.cancel_button.configure(state="normal")
-        self.pdf_radio.configure(state="disabled")
-        self.png_radio.configure(state="disabled")
-
-    def process_queue(self):
-        """信息处理"""
-        while not self.queue.empty():
-            msg_type, msg_content = self.queue.get()
-            if msg_type == "info":
-                messagebox.showinfo("信息", msg_content)
-            elif msg_type == "warning":
-                messagebox.showwarning("警告", msg_content)
-            elif msg_type == "error":
-                messagebox.showerror("错误", msg_content)
-            elif msg_type == "progress":
-                self.progress_bar.set(msg_content)
-        self.timer = self.root.after(100, self.process_queue)
-
-    def run(self):
-        """运行应用"""
-        self.root.mainloop()
+        job.state = Job.RUNNING
+        recorder = RunRecorder(job.name, job.queue, job.profile)
+        try:
+            recorder.run(job.func, *job.args, is_canceled_callback=job.token, queue=recorder, **job.kwargs)
+        except Exception as e:
+            job.queue.put(("error", f"出现错误: {e}"))
+        if job.token():
+            job.state = Job.CANCELED
+        elif job.queue.has_error:
+            job.state = Job.FAILED
+        else:
+            job.state = Job.FINISHED
+
+    def jobs(self):
+        """按提交顺序返回所有未移除的任务"""
+        with self._lock:
+            return list(self._jobs)
+
+    def remove(self, job):
+        """从列表中移除已结束的任务"""
+        with self._lock:
+            if job in self._jobs:
+                self._jobs.remove(job)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            job.cancel()
+
+    def shutdown(self):
+        """取消所有任务并停止线程池，不等待运行中的任务结束"""
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class ConsoleQueue:
+    """命令行模式下代替 queue.Queue，直接将消息输出到终端，并记录是否出现过错误"""
+    def __init__(self, stream=sys.stdout, error_stream=sys.stderr):
+        self.stream = stream
+        self.error_stream = error_stream
+        self.has_error = False
+        self._last_percent = None
+        self._status = ""
+
+    def put(self, message):
+        msg_type, msg_content = message
+        if msg_type in ("timing", "stats"):
+            return
+        if msg_type in ("progress", "status"):
+            # 输出被重定向到文件时不显示进度
+            if not self.error_stream.isatty():
+                return
+            if msg_type == "status":
+                # 进度到达 100% 后已换行，不再刷新
+                if msg_content != self._status and (self._last_percent or 0) < 100:
+                    self._status = msg_content
+                    self._write_progress()
+                return
+            percent = int(msg_content * 100)
+            if percent != self._last_percent:
+                self._last_percent = percent
+                self._write_progress()
+                if percent >= 100:
+                    self.error_stream.write("\n")
+                    self.error_stream.flush()
+            return
+        if msg_type == "error":
+            self.has_error = True
+        stream = self.error_stream if msg_type in ("warning", "error") else self.stream
+        label = MESSAGE_LABELS.get(msg_type, msg_type)
+        print(f"[{label}] {msg_content}", file=stream, flush=True)
+
+    def _write_progress(self):
+        """在同一行刷新进度和当前阶段"""
+        percent = self._last_percent or 0
+        self.error_stream.write(f"\r进度: {percent:3d}%  {self._status}\033[K")
+        self.error_stream.flush()
+
+def collect_excel_files(paths, exclude_directory=None):
+    """展开命令行中的文件和目录，目录会递归查找 .xlsx 文件（跳过 Excel 临时文件和输出目录）"""
+    exclude_directory = os.path.abspath(exclude_directory) if exclude_directory else None
+    filepaths = []
+    for path in paths:
+        if not os.path.isdir(path):
+            filepaths.append(path)
+            continue
+        found = []
+        for root, dirs, files in os.walk(path):
+            if exclude_directory:
+                dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude_directory]
+            found.extend(os.path.join(root, name) for name in files
+                         if name.lower().endswith(".xlsx") and not name.startswith("~$"))
+        filepaths.extend(sorted(found))
+    return filepaths
+
+def build_argument_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(
+        prog="ExamAnalysisTool",
+        description="考试成绩分析工具（命令行模式）。不带参数运行时启动图形界面。")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("files", nargs="+", help="Excel 文件或包含 Excel 文件的目录（递归查找 .xlsx）")
+    common.add_argument("--out", required=True, help="输出目录，不存在时自动创建")
+    common.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行进程数，默认为 CPU 核数")
+    common.add_argument("--incremental", action="store_true",
+                        help="增量生成：在输出目录中保存计算状态或输出清单，只处理新增或变化的数据")
+    common.add_argument("--profile", action="store_true",
+                        help=f"记录 cProfile 性能分析结果（保存在 {LOG_DIRECTORY} 中）")
+
+    progress_parser = subparsers.add_parser("progress", parents=[common], help="生成进退步系数报表")
+    progress_parser.add_argument("--streaming", action="store_true", help="流式写入 Excel")
+
+    charts_parser = subparsers.add_parser("charts", parents=[common], help="生成年级排名折线图")
+    charts_parser.add_argument("--format", choices=["pdf", "png"], default="pdf", help="输出格式")
+    charts_parser.add_argument("--mode", choices=["separate", "combined", "per_class"], default="separate",
+                               help="每位学生一个文件 / 合并为一个 PDF / 按班级合并 PDF")
+    charts_parser.add_argument("--dpi", type=int, default=CHART_DPI, help="输出分辨率")
+
+    report_parser = subparsers.add_parser("report", parents=[common], help="生成历次考试成绩单")
+    report_parser.add_argument("--streaming", action="store_true", help="流式写入 Excel")
+    report_parser.add_argument("--mode", choices=["separate", "workbook", "per_class"], default="separate",
+                               help="每位学生一个文件 / 所有学生写入一个工作簿 / 按班级写入工作簿")
+    return parser
+
+def run_cli(argv):
+    """命令行入口，不导入任何图形界面库；出现错误时返回非零值"""
+    args = build_argument_parser().parse_args(argv)
+    filepaths = collect_excel_files(args.files, exclude_directory=args.out)
+    if not filepaths:
+        print("[错误] 没有找到 Excel 文件", file=sys.stderr)
+        return 2
+    os.makedirs(args.out, exist_ok=True)
+
+    # 先预检所有文件，一次报告所有问题；增量计算进退步系数时已处理过的文件不再读取
+    state = None
+    if args.command == "progress" and args.incremental:
+        state = ProgressState.load(os.path.join(args.out, PROGRESS_STATE_FILE))
+        if state is not None and not state.is_current(filepaths):
+            state = None
+    problems = [message for result in DataProcessor.preflight(filepaths, max_workers=args.workers, state=state)
+                for message in result.messages()]
+    if problems:
+        for problem in problems:
+            print(f"[错误] {problem}", file=sys.stderr)
+        return 1
+
+    console = ConsoleQueue()
+    recorder = RunRecorder(args.command, console, args.profile)
+    is_canceled_callback = lambda: False
+    if args.command == "progress":
+        recorder.run(ProgressCalculator.calculate_progress, filepaths, args.out, is_canceled_callback, recorder,
+                     args.streaming, args.incremental)
+    elif args.command == "charts":
+        recorder.run(RankingChartGenerator.generate_ranking_charts, filepaths, args.out, is_canceled_callback,
+                     recorder, args.format, args.workers, args.mode, args.dpi, args.incremental)
+    elif args.command == "report":
+        recorder.run(HistoricalReportGenerator.generate_report, filepaths, args.out, is_canceled_callback, recorder,
+                     args.streaming, args.mode, args.workers, args.incremental)
+    return 1 if console.has_error else 0
+
+def main(argv=None):
+    """带参数时以命令行模式运行，否则启动图形界面（--profile-startup 输出启动耗时）"""
+    argv = sys.argv[1:] if argv is None else argv
+    profile_startup = "--profile-startup" in argv
+    argv = [arg for arg in argv if arg != "--profile-startup"]
+    if argv:
+        return run_cli(argv)
+
+    # 图形界面模块会导入本模块，以脚本运行时注册模块名，避免重复导入
+    sys.modules.setdefault("ExamAnalysisTool", sys.modules[__name__])
+    from ExamAnalysisToolGUI import ExamAnalysisToolGUI
+    app = ExamAnalysisToolGUI(profile_startup=profile_startup)
+    app.run()
+    return 0
 
 if __name__ == "__main__":
-    app = ExamAnalysisToolGUI()
-    app.run()
+    multiprocessing.freeze_support()  # PyInstaller 打包后子进程需要
+    sys.exit(main())
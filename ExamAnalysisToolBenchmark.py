@@ -0,0 +1,259 @@
+# File: ExamAnalysisToolBenchmark.py
+
+"""
+性能基准测试：按指定规模生成模拟的历次考试数据，分别运行进退步系数、年级排名折线图和历次考试成绩单，
+记录每个阶段（读取、校验、合并、计算、写出）的耗时，结果以 JSON 输出，便于在版本之间比较
+
+    python ExamAnalysisToolBenchmark.py --students 2000 --exams 10 --output 结果.json
+    python ExamAnalysisToolBenchmark.py --students 2000 --exams 10 --compare 上一版本.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import logging
+import warnings
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+import ExamAnalysisTool as core
+from ExamAnalysisTool import (
+    ProgressCalculator, RankingChartGenerator, HistoricalReportGenerator, DataProcessor, CLASS_COLUMN, pd, np
+)
+
+# 结果文件的格式版本，字段变化时递增
+RESULT_VERSION = 1
+# 模拟数据可用的科目及满分
+SUBJECTS = [("语文", 150), ("数学", 150), ("英语", 150), ("物理", 100), ("化学", 100), ("生物", 100),
+            ("政治", 100), ("历史", 100), ("地理", 100)]
+# 模拟数据每个班级的人数
+CLASS_SIZE = 50
+# 可以测试的报表
+CASES = ["progress", "charts", "report"]
+# 比较结果时，耗时增加不足此秒数的阶段不算变慢，避免极短的阶段因计时误差误报
+MIN_REGRESSION_SECONDS = 0.05
+
+def generate_history(directory, students, exams, subjects=6, missing_rate=0.02, new_student_rate=0.05, seed=0):
+    """
+    在 directory 中生成 exams 个考试文件（1.xlsx、2.xlsx……），返回 (文件路径列表, 总行数)
+    每位学生每次考试以 missing_rate 的概率缺考（对应示例中的“中途缺考”），
+    new_student_rate 比例的学生从之后的某次考试才开始出现（对应示例中的“新同学”），
+    级名按总分排名，相同总分取最小名次
+    """
+    if not 1 <= subjects <= len(SUBJECTS):
+        raise ValueError(f"科目数应在 1 到 {len(SUBJECTS)} 之间")
+    rng = np.random.default_rng(seed)
+    random_module = random.Random(seed)
+    subject_columns = SUBJECTS[:subjects]
+    names = np.array([f"同学{i + 1}" for i in range(students)], dtype=object)
+    classes = np.arange(students) // CLASS_SIZE + 1
+
+    # 每位学生第一次参加的考试
+    first_exam = np.ones(students, dtype=int)
+    if exams > 1:
+        new_students = random_module.sample(range(students), int(students * new_student_rate))
+        first_exam[new_students] = rng.integers(2, exams + 1, size=len(new_students))
+    # 学生的基础水平，使排名在各次考试之间有一定的连续性
+    ability = rng.normal(0.7, 0.12, size=(students, 1))
+
+    os.makedirs(directory, exist_ok=True)
+    filepaths = []
+    rows = 0
+    for exam in range(1, exams + 1):
+        present = (first_exam <= exam) & (rng.random(students) >= missing_rate)
+        count = int(present.sum())
+        rows += count
+        data = {"考试编号": np.full(count, exam), "姓名": names[present], CLASS_COLUMN: classes[present]}
+        total = np.zeros(count, dtype=int)
+        for subject, full_mark in subject_columns:
+            ratio = ability[present, 0] + rng.normal(0, 0.08, size=count)
+            scores = np.clip(np.rint(ratio * full_mark), 0, full_mark).astype(int)
+            data[subject] = scores
+            total += scores
+        df = pd.DataFrame(data)
+        df["级名"] = pd.Series(total).rank(ascending=False, method="min").astype(int).to_numpy()
+        filepath = os.path.join(directory, f"{exam}.xlsx")
+        DataProcessor.write_excel(df, filepath, streaming=True)
+        filepaths.append(filepath)
+    return filepaths, rows
+
+class BenchmarkQueue:
+    """代替消息队列，记录各阶段的耗时和处理的行数、学生数，以及警告和错误"""
+    def __init__(self):
+        self.timings = []
+        self.stats = {}
+        self.errors = []
+        self.warnings = 0
+
+    def put(self, message):
+        msg_type, msg_content = message
+        if msg_type == "timing":
+            self.timings.append(msg_content)
+        elif msg_type == "stats":
+            self.stats.update(msg_content)
+        elif msg_type == "error":
+            self.errors.append(msg_content)
+        elif msg_type == "warning":
+            self.warnings += 1
+
+def run_case(case, filepaths, save_directory, options):
+    """运行一次报表生成，返回总耗时和各阶段的耗时"""
+    queue = BenchmarkQueue()
+    is_canceled_callback = lambda: False
+    start = time.perf_counter()
+    if case == "progress":
+        ProgressCalculator.calculate_progress(filepaths, save_directory, is_canceled_callback, queue,
+                                              options.streaming)
+    elif case == "charts":
+        RankingChartGenerator.generate_ranking_charts(filepaths, save_directory, is_canceled_callback, queue,
+                                                      options.format, options.workers, options.chart_mode,
+                                                      options.dpi)
+    else:
+        HistoricalReportGenerator.generate_report(filepaths, save_directory, is_canceled_callback, queue,
+                                                  options.streaming, options.report_mode, options.workers)
+    total = time.perf_counter() - start
+    if queue.errors:
+        raise RuntimeError(f"{case} 出现错误: {queue.errors[0]}")
+    stages = {timing["phase"]: {"seconds": timing["seconds"], "items": timing["items"]} for timing in queue.timings}
+    return {"seconds": total, "stages": stages, "warnings": queue.warnings, **queue.stats}
+
+def summarize_runs(runs):
+    """多次运行取中位数，并计算每秒处理的项数"""
+    result = {"seconds": statistics.median(run["seconds"] for run in runs), "runs": [run["seconds"] for run in runs],
+              "rows": runs[0].get("rows"), "students": runs[0].get("students"), "stages": {}}
+    for phase in runs[0]["stages"]:
+        seconds = statistics.median(run["stages"][phase]["seconds"] for run in runs if phase in run["stages"])
+        items = runs[0]["stages"][phase]["items"]
+        result["stages"][phase] = {"seconds": seconds, "items": items,
+                                   "items_per_second": items / seconds if seconds > 0 else None}
+    return result
+
+def run_benchmark(options, work_directory):
+    """生成数据并依次运行各报表，返回结果字典"""
+    data_directory = os.path.join(work_directory, "data")
+    start = time.perf_counter()
+    filepaths, rows = generate_history(data_directory, options.students, options.exams, options.subjects,
+                                       options.missing_rate, options.new_student_rate, options.seed)
+    generate_seconds = time.perf_counter() - start
+
+    # 磁盘缓存放在临时目录中，不影响也不使用用户的缓存
+    core.columnar_cache.directory = os.path.join(work_directory, "cache")
+    results = {}
+    for case in options.cases:
+        runs = []
+        for _ in range(options.repeat):
+            if not options.warm:
+                core.dataset_cache.clear()
+                core.columnar_cache.clear()
+            save_directory = os.path.join(work_directory, case)
+            shutil.rmtree(save_directory, ignore_errors=True)
+            os.makedirs(save_directory)
+            runs.append(run_case(case, filepaths, save_directory, options))
+        results[case] = summarize_runs(runs)
+        print(f"{case}: {results[case]['seconds']:.3f} 秒", file=sys.stderr)
+
+    return {
+        "version": RESULT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parameters": {
+            "students": options.students, "exams": options.exams, "subjects": options.subjects,
+            "missing_rate": options.missing_rate, "new_student_rate": options.new_student_rate,
+            "seed": options.seed, "repeat": options.repeat, "warm": options.warm, "workers": options.workers,
+            "streaming": options.streaming, "format": options.format, "dpi": options.dpi,
+            "chart_mode": options.chart_mode, "report_mode": options.report_mode,
+        },
+        "environment": {
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "pandas": pd.__version__, "numpy": np.__version__,
+            "pyarrow": core.columnar_cache.enabled, "xlsxwriter": core._optional_module("xlsxwriter") is not None,
+        },
+        "data": {"files": len(filepaths), "rows": rows, "generate_seconds": generate_seconds},
+        "results": results,
+    }
+
+def compare_results(baseline, current, threshold):
+    """逐项比较两次结果，返回变慢超过 threshold 倍的项目说明；参数不同时只比较共同的报表和阶段"""
+    ignored = {"repeat"}
+    parameters = [{key: value for key, value in result.get("parameters", {}).items() if key not in ignored}
+                  for result in (baseline, current)]
+    if parameters[0] != parameters[1]:
+        print("[警告] 两次测试的参数不同，比较结果仅供参考", file=sys.stderr)
+    regressions = []
+    print(f"{'报表':<10}{'阶段':<10}{'之前':>10}{'现在':>10}{'倍数':>8}", file=sys.stderr)
+    for case, result in current["results"].items():
+        old = baseline.get("results", {}).get(case)
+        if old is None:
+            continue
+        pairs = [("总计", old["seconds"], result["seconds"])]
+        pairs += [(phase, old["stages"][phase]["seconds"], stage["seconds"])
+                  for phase, stage in result["stages"].items() if phase in old["stages"]]
+        for phase, before, after in pairs:
+            ratio = after / before if before > 0 else float("inf")
+            print(f"{case:<10}{phase:<10}{before:>10.3f}{after:>10.3f}{ratio:>8.2f}x", file=sys.stderr)
+            if ratio > threshold and after - before >= MIN_REGRESSION_SECONDS:
+                regressions.append(f"{case} {phase}: {before:.3f} 秒 -> {after:.3f} 秒")
+    return regressions
+
+def build_argument_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog="ExamAnalysisToolBenchmark", description="考试成绩分析工具的性能基准测试")
+    parser.add_argument("--students", type=int, default=1000, help="学生人数")
+    parser.add_argument("--exams", type=int, default=10, help="考试次数")
+    parser.add_argument("--subjects", type=int, default=6, help=f"科目数（1 到 {len(SUBJECTS)}）")
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="每位学生每次考试缺考的概率")
+    parser.add_argument("--new-student-rate", type=float, default=0.05, help="中途加入的学生比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同参数和种子生成相同的数据")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES, help="要测试的报表")
+    parser.add_argument("--repeat", type=int, default=1, help="每个报表运行的次数，结果取中位数")
+    parser.add_argument("--warm", action="store_true", help="保留各次运行之间的文件缓存（默认每次都重新读取）")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数")
+    parser.add_argument("--streaming", action="store_true", help="流式写入 Excel")
+    parser.add_argument("--format", choices=["pdf", "png"], default="png", help="折线图格式")
+    parser.add_argument("--dpi", type=int, default=core.CHART_DPI, help="折线图分辨率")
+    parser.add_argument("--chart-mode", choices=["separate", "combined", "per_class"], default="separate",
+                        help="折线图输出方式")
+    parser.add_argument("--report-mode", choices=["separate", "workbook", "per_class"], default="separate",
+                        help="成绩单输出方式")
+    parser.add_argument("--keep", metavar="目录", help="在此目录中生成数据和输出并保留，默认使用临时目录")
+    parser.add_argument("--output", metavar="文件", help="结果写入 JSON 文件，默认输出到终端")
+    parser.add_argument("--compare", metavar="文件", help="与之前的结果比较，变慢超过阈值时返回非零退出码")
+    parser.add_argument("--threshold", type=float, default=1.2, help="判定为变慢的耗时倍数")
+    return parser
+
+def main(argv=None):
+    options = build_argument_parser().parse_args(argv)
+    # 缺少中文字体时 matplotlib 会为每张图输出警告，不计入结果
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+    warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+    if options.keep:
+        os.makedirs(options.keep, exist_ok=True)
+        result = run_benchmark(options, options.keep)
+    else:
+        with tempfile.TemporaryDirectory(prefix="ExamAnalysisBenchmark") as work_directory:
+            result = run_benchmark(options, work_directory)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, result, options.threshold)
+        for regression in regressions:
+            print(f"[警告] 变慢: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,753 @@
+# File: ExamAnalysisToolGUI.py
+
+import os
+import sys
+import time
+import collections
+import threading
+import subprocess
+import customtkinter as ctk
+import tkinter as tk
+from tkinter import messagebox, filedialog
+from ExamAnalysisTool import (
+    STARTUP_TIME, CHART_DPI, CHART_PREVIEW_DPI, LOG_DIRECTORY, MESSAGE_LABELS, dataset_cache, columnar_cache,
+    preload_modules,
+    MessageQueue, Job, JobScheduler, CancelToken, DataProcessor, ProgressCalculator, RankingChartGenerator,
+    RankingChartTemplate, HistoricalReportGenerator,
+)
+
+class FileHandler:
+    """文件处理"""
+    def __init__(self):
+        self.filepaths = []
+
+    def load_files(self):
+        """选择文件并更新列表"""
+        filepaths = filedialog.askopenfilenames(title="选择文件", filetypes=[("Excel files", "*.xlsx")])
+        self.filepaths = filepaths
+        return self.filepaths
+
+class FileCard(ctk.CTkFrame):
+    # 预检状态对应的文字颜色
+    STATUS_COLORS = {"pending": ("gray40", "gray60"), "ok": ("green4", "#6bcf7f"), "error": ("red3", "#ff6b6b")}
+
+    def __init__(self, master, filepath, remove_callback=None):
+        super().__init__(master, fg_color=("gray90", "gray13"))
+        self.filepath = filepath
+        self.remove_callback = remove_callback
+        self._create_widgets()
+
+    def _create_widgets(self):
+        # 文件图标
+        self.icon_label = ctk.CTkLabel(self, text="📄", width=30)
+        self.icon_label.pack(side="left", padx=5)
+
+        # 文件名和路径
+        text_frame = ctk.CTkFrame(self, fg_color="transparent")
+        text_frame.pack(side="left", fill="x", expand=True)
+        
+        self.name_label = ctk.CTkLabel(text_frame, text=os.path.basename(self.filepath), 
+                                      font=ctk.CTkFont(weight="bold"))
+        self.name_label.pack(anchor="w")
+        
+        self.path_label = ctk.CTkLabel(text_frame, text=self.filepath, 
+                                      text_color=("gray40", "gray60"), font=ctk.CTkFont(size=12))
+        self.path_label.pack(anchor="w")
+
+        # 预检结果
+        self.status_label = ctk.CTkLabel(text_frame, text="", font=ctk.CTkFont(size=12),
+                                        justify="left", wraplength=220)
+        self.status_label.pack(anchor="w")
+
+        # 删除按钮
+        self.remove_btn = ctk.CTkButton(self, text="×", width=30, height=30, 
+                                      fg_color="transparent", hover_color=("gray80", "gray20"),
+                                      command=self._on_remove)
+        self.remove_btn.pack(side="right", padx=5)
+
+        # 添加悬停效果
+        self.bind("<Enter>", lambda e: self.configure(fg_color=("gray85", "gray15")))
+        self.bind("<Leave>", lambda e: self.configure(fg_color=("gray90", "gray13")))
+
+        # 添加文件类型校验图标
+        file_ext = os.path.splitext(self.filepath)[1].lower()
+        icon = "📊" if file_ext == ".xlsx" else "❓"
+        self.icon_label.configure(text=icon)
+
+    def _on_remove(self):
+        if self.remove_callback:
+            self.remove_callback(self.filepath)
+        self.destroy()
+
+    def set_status(self, text, state="pending"):
+        """显示预检状态：pending 校验中，ok 通过，error 有问题"""
+        self.status_label.configure(text=text, text_color=self.STATUS_COLORS[state])
+
+class JobCard(ctk.CTkFrame):
+    """任务列表中的一项：名称、状态、进度和取消按钮"""
+    def __init__(self, master, job):
+        super().__init__(master, fg_color=("gray90", "gray13"))
+        self.job = job
+        self.progress = 0.0
+        self.status = ""
+        self._create_widgets()
+
+    def _create_widgets(self):
+        text_frame = ctk.CTkFrame(self, fg_color="transparent")
+        text_frame.pack(side="left", padx=5, fill="x", expand=True)
+
+        self.name_label = ctk.CTkLabel(text_frame, text=f"#{self.job.id} {self.job.name}",
+                                       font=ctk.CTkFont(weight="bold"))
+        self.name_label.pack(anchor="w")
+
+        self.state_label = ctk.CTkLabel(text_frame, text=self.job.state,
+                                        text_color=("gray40", "gray60"), font=ctk.CTkFont(size=12))
+        self.state_label.pack(anchor="w")
+
+        self.progress_bar = ctk.CTkProgressBar(text_frame, height=8)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(fill="x", pady=(0, 5))
+
+        # 取消按钮
+        self.cancel_btn = ctk.CTkButton(self, text="×", width=30, height=30,
+                                        fg_color="transparent", hover_color=("gray80", "gray20"),
+                                        command=self.job.cancel)
+        self.cancel_btn.pack(side="right", padx=5)
+
+    def update_job(self, progress, status):
+        """刷新进度和状态，参数为 None 时保持不变"""
+        if progress is not None:
+            self.progress = progress
+            self.progress_bar.set(progress)
+        if status is not None:
+            self.status = status
+        text = f"{self.job.state}  {self.status}" if self.status else self.job.state
+        self.state_label.configure(text=text)
+
+class StudentPreviewWindow(ctk.CTkToplevel):
+    """
+    单个学生的年级排名折线图预览：搜索并选择学生后只绘制该学生的折线图
+    数据来自 StudentHistoryStore，绘制结果按学生缓存，输入时延迟一段时间再搜索
+    """
+    # 输入停止多久后开始搜索（毫秒）
+    SEARCH_DELAY_MS = 200
+    # 最多缓存多少位学生的绘制结果
+    CACHE_SIZE = 32
+
+    def __init__(self, master, close_callback=None):
+        super().__init__(master)
+        self.title("学生预览")
+        self.geometry("800x500")
+        self.close_callback = close_callback
+        self.store = None
+        self.visible_ids = []  # 列表中每一行对应的学生编号
+        self.current_id = None
+        self.search_timer = None
+        self.cache = collections.OrderedDict()  # 学生编号 -> 已绘制的图像
+        self._create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _create_widgets(self):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        # 左侧：搜索框和学生列表
+        list_frame = ctk.CTkFrame(self)
+        list_frame.pack(side="left", padx=10, pady=10, fill="y")
+
+        # 不使用 textvariable，否则 CTkEntry 不显示占位文字
+        self.search_entry = ctk.CTkEntry(list_frame, placeholder_text="搜索姓名")
+        self.search_entry.pack(padx=5, pady=5, fill="x")
+        self.search_entry.bind("<KeyRelease>", self._on_search_changed)
+        self.search_entry.bind("<Return>", self._select_first)
+
+        listbox_frame = ctk.CTkFrame(list_frame, fg_color="transparent")
+        listbox_frame.pack(padx=5, pady=5, fill="both", expand=True)
+        self.student_listbox = tk.Listbox(listbox_frame, width=16, exportselection=False, activestyle="none")
+        self.student_listbox.pack(side="left", fill="both", expand=True)
+        scrollbar = ctk.CTkScrollbar(listbox_frame, command=self.student_listbox.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.student_listbox.configure(yscrollcommand=scrollbar.set)
+        self.student_listbox.bind("<<ListboxSelect>>", self._on_select)
+
+        self.count_label = ctk.CTkLabel(list_frame, text="正在加载数据…", font=ctk.CTkFont(size=12))
+        self.count_label.pack(pady=5)
+
+        # 右侧：折线图
+        self.template = RankingChartTemplate()
+        self.canvas = FigureCanvasTkAgg(self.template.fig, master=self)
+        self.canvas.get_tk_widget().pack(side="right", padx=10, pady=10, fill="both", expand=True)
+        # 窗口大小变化后缓存的图像尺寸不再匹配
+        self.canvas.mpl_connect("resize_event", lambda event: self.cache.clear())
+
+    def _on_close(self):
+        if self.search_timer is not None:
+            self.after_cancel(self.search_timer)
+        if self.close_callback:
+            self.close_callback()
+        self.destroy()
+
+    def set_loading(self, text="正在加载数据…"):
+        """文件列表变化后清空列表，等待新的数据"""
+        self.store = None
+        self.cache.clear()
+        self.current_id = None
+        self.visible_ids = []
+        self.student_listbox.delete(0, "end")
+        self.count_label.configure(text=text)
+
+    def set_store(self, store):
+        """使用新加载的数据，按当前的搜索内容刷新列表"""
+        self.store = store
+        self.cache.clear()
+        self.current_id = None
+        self.refresh_list()
+
+    def _on_search_changed(self, *args):
+        """输入时重新计时，停止输入 SEARCH_DELAY_MS 后才搜索"""
+        if self.search_timer is not None:
+            self.after_cancel(self.search_timer)
+        self.search_timer = self.after(self.SEARCH_DELAY_MS, self.refresh_list)
+
+    def refresh_list(self):
+        """按搜索内容筛选学生列表"""
+        self.search_timer = None
+        if self.store is None:
+            return
+        self.visible_ids = self.store.search(self.search_entry.get().strip()).tolist()
+        self.student_listbox.delete(0, "end")
+        if self.visible_ids:
+            self.student_listbox.insert("end", *self.store.students[self.visible_ids])
+        self.count_label.configure(text=f"共 {len(self.store)} 位学生，匹配 {len(self.visible_ids)} 位")
+        if self.current_id in self.visible_ids:
+            row = self.visible_ids.index(self.current_id)
+            self.student_listbox.selection_set(row)
+            self.student_listbox.see(row)
+        elif len(self.visible_ids) == 1:
+            self.show_student(self.visible_ids[0])
+            self.student_listbox.selection_set(0)
+
+    def _select_first(self, event=None):
+        """回车时立即搜索并显示第一个匹配的学生"""
+        if self.search_timer is not None:
+            self.after_cancel(self.search_timer)
+        self.refresh_list()
+        if self.visible_ids:
+            self.student_listbox.selection_clear(0, "end")
+            self.student_listbox.selection_set(0)
+            self.show_student(self.visible_ids[0])
+
+    def _on_select(self, event=None):
+        selection = self.student_listbox.curselection()
+        if selection:
+            self.show_student(self.visible_ids[selection[0]])
+
+    def show_student(self, student_id):
+        """显示一位学生的折线图，缓存中有该学生时直接贴回已绘制的图像"""
+        if self.store is None or student_id == self.current_id:
+            return
+        self.current_id = student_id
+        exam_numbers, ranks = self.store.history(student_id)
+        # 缓存命中时也更新模板，窗口重绘时显示的仍是当前学生
+        self.template.update(self.store.students[student_id], exam_numbers.tolist(), ranks.tolist())
+        bbox = self.template.fig.bbox
+        image = self.cache.get(student_id)
+        if image is not None:
+            self.cache.move_to_end(student_id)
+            self.canvas.restore_region(image)
+            self.canvas.blit(bbox)
+            return
+        self.canvas.draw()
+        self.cache[student_id] = self.canvas.copy_from_bbox(bbox)
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+class ExamAnalysisToolGUI:
+    """主页面"""
+    # 折线图输出方式：(显示文本, output_mode)
+    CHART_OUTPUT_MODES = [
+        ("每位学生一个文件", "separate"),
+        ("合并为一个 PDF", "combined"),
+        ("按班级合并 PDF", "per_class"),
+    ]
+    # 成绩单输出方式：(显示文本, output_mode)
+    REPORT_OUTPUT_MODES = [
+        ("每位学生一个文件", "separate"),
+        ("所有学生写入一个工作簿", "workbook"),
+        ("按班级写入工作簿", "per_class"),
+    ]
+    # 日志面板最多保留的行数
+    LOG_MAX_LINES = 1000
+
+    def __init__(self, profile_startup=False):
+        self.root = ctk.CTk()  # 创建 CTk 窗口
+        self.root.title("考试成绩分析工具")
+        self.root.geometry("900x700")  # 设置窗口默认大小
+        
+        self.file_handler = FileHandler()  # 需要实现 FileHandler 类
+        self.queue = MessageQueue()  # 界面自身的消息，任务的消息在各自的队列中
+        self.scheduler = JobScheduler()
+        self.job_cards = {}  # 任务编号 -> JobCard
+        self.file_cards = {}  # 文件 -> FileCard
+        self.preflight_token = None  # 当前预检的取消标记
+        self.preflight_results = {}  # 文件 -> PreflightResult，只包含最近一次完成的预检
+        self.preview_window = None  # 学生预览窗口，未打开时为 None
+        self.preview_token = None  # 当前加载预览数据的取消标记
+        self.is_on_top = False
+        self.profile_startup = profile_startup
+        self.window_shown = False
+
+        self.file_format_variable = tk.StringVar(value="pdf")  # 单选按钮变量
+        self.parallel_variable = tk.BooleanVar(value=True)  # 多进程生成折线图和成绩单
+        self.preview_variable = tk.BooleanVar(value=False)  # 低分辨率预览
+        self.streaming_variable = tk.BooleanVar(value=False)  # 流式写入 Excel
+        self.incremental_variable = tk.BooleanVar(value=False)  # 增量生成，只处理新增或变化的数据
+        self.profile_variable = tk.BooleanVar(value=False)  # 记录 cProfile 性能分析结果
+        self.report_output_variable = tk.StringVar(value=self.REPORT_OUTPUT_MODES[0][0])  # 成绩单输出方式
+        self.chart_output_variable = tk.StringVar(value=self.CHART_OUTPUT_MODES[0][0])  # 折线图输出方式
+
+        self.init_ui()
+        self.setup_menu()  # 初始化菜单栏
+        self.timer = self.root.after(100, self.process_queue)
+        self.progress_bar.set(0)
+        self.root.bind("<Map>", self._on_map, add="+")
+
+    def _on_map(self, event):
+        """窗口首次显示后，在后台线程加载数据处理和绘图库"""
+        if event.widget is not self.root or self.window_shown:
+            return
+        self.window_shown = True
+        shown_after = time.perf_counter() - STARTUP_TIME
+        threading.Thread(target=self._preload_modules, args=(shown_after,), daemon=True).start()
+
+    def _preload_modules(self, shown_after):
+        """预加载数据处理库，并在 --profile-startup 时报告启动耗时"""
+        elapsed = preload_modules()
+        if self.profile_startup:
+            message = f"启动耗时：窗口显示 {shown_after * 1000:.0f} ms，后台加载数据处理库 {elapsed * 1000:.0f} ms"
+            print(message)
+            self.queue.put(("log", message))
+
+    def init_ui(self):
+        """初始化 UI"""
+        self.central_widget = ctk.CTkFrame(self.root)
+        self.central_widget.pack(padx=20, pady=20, fill="both", expand=True)
+
+        # 左侧区域
+        left_frame = ctk.CTkFrame(self.central_widget)
+        left_frame.pack(side="left", padx=10, pady=10, fill="both", expand=True)
+
+        self.file_label = ctk.CTkLabel(left_frame, text="已选择的成绩文件：")
+        self.file_label.pack(pady=10)
+
+        self.file_scrollframe = ctk.CTkScrollableFrame(left_frame, width=250, height=200)
+        self.file_scrollframe.pack(padx=10, pady=10, fill="both", expand=True)
+
+        # 任务列表：等待中和运行中的任务
+        self.job_label = ctk.CTkLabel(left_frame, text="任务：")
+        self.job_label.pack()
+
+        self.job_scrollframe = ctk.CTkScrollableFrame(left_frame, width=250, height=100)
+        self.job_scrollframe.pack(padx=10, pady=(0, 10), fill="both", expand=True)
+
+        # 日志面板：警告和日志集中显示，不再逐条弹窗
+        self.log_label = ctk.CTkLabel(left_frame, text="日志：")
+        self.log_label.pack()
+
+        self.log_textbox = ctk.CTkTextbox(left_frame, width=250, height=150, wrap="word", state="disabled")
+        self.log_textbox.pack(padx=10, pady=(0, 10), fill="both", expand=True)
+
+        # 右侧区域
+        right_frame = ctk.CTkFrame(self.central_widget)
+        right_frame.pack(side="right", padx=10, pady=10, fill="both", expand=True)
+
+        self.input_file_button = ctk.CTkButton(right_frame, text="选择文件", command=self.load_input_files)
+        self.input_file_button.pack(pady=10)
+
+        self.analyze_button = ctk.CTkButton(right_frame, text="生成进退步系数报表", command=self.start_calculate_progress)
+        self.analyze_button.pack(pady=10)
+
+        self.chart_button = ctk.CTkButton(right_frame, text="生成年级排名折线图", command=self.start_generate_ranking_charts)
+        self.chart_button.pack(pady=10)
+
+        # 添加单选按钮
+        pdf_png_frame = ctk.CTkFrame(right_frame)
+        pdf_png_frame.pack(pady=10)
+
+        self.pdf_radio = ctk.CTkRadioButton(pdf_png_frame, text="输出为 PDF", variable=self.file_format_variable, value="pdf")
+        self.pdf_radio.pack(side="left", padx=10)
+
+        self.png_radio = ctk.CTkRadioButton(pdf_png_frame, text="输出为 PNG", variable=self.file_format_variable, value="png")
+        self.png_radio.pack(side="left", padx=10)
+
+        self.chart_output_menu = ctk.CTkOptionMenu(right_frame, variable=self.chart_output_variable,
+                                                   values=[label for label, _ in self.CHART_OUTPUT_MODES])
+        self.chart_output_menu.pack(pady=5)
+
+        self.preview_student_button = ctk.CTkButton(right_frame, text="预览单个学生", command=self.open_student_preview)
+        self.preview_student_button.pack(pady=5)
+
+        self.parallel_checkbox = ctk.CTkCheckBox(right_frame, text="多进程生成折线图和成绩单", variable=self.parallel_variable)
+        self.parallel_checkbox.pack(pady=5)
+
+        self.preview_checkbox = ctk.CTkCheckBox(right_frame, text=f"低分辨率预览（{CHART_PREVIEW_DPI} DPI）",
+                                                variable=self.preview_variable)
+        self.preview_checkbox.pack(pady=5)
+
+        self.report_button = ctk.CTkButton(right_frame, text="生成历次考试成绩单", command=self.start_generate_report)
+        self.report_button.pack(pady=10)
+
+        self.report_output_menu = ctk.CTkOptionMenu(right_frame, variable=self.report_output_variable,
+                                                    values=[label for label, _ in self.REPORT_OUTPUT_MODES])
+        self.report_output_menu.pack(pady=5)
+
+        self.streaming_checkbox = ctk.CTkCheckBox(right_frame, text="流式写入 Excel（适合大文件）",
+                                                  variable=self.streaming_variable)
+        self.streaming_checkbox.pack(pady=5)
+
+        self.incremental_checkbox = ctk.CTkCheckBox(right_frame, text="增量生成（跳过未变化的考试和学生）",
+                                                    variable=self.incremental_variable)
+        self.incremental_checkbox.pack(pady=5)
+
+        self.profile_checkbox = ctk.CTkCheckBox(right_frame, text="记录性能分析（cProfile）",
+                                                variable=self.profile_variable)
+        self.profile_checkbox.pack(pady=5)
+
+        self.cancel_button = ctk.CTkButton(right_frame, text="取消全部任务", state="disabled", command=self.cancel_operation)
+        self.cancel_button.pack(pady=10)
+
+        self.progress_bar = ctk.CTkProgressBar(right_frame, width=300)
+        self.progress_bar.pack(pady=10)
+
+        # 当前阶段和预计剩余时间
+        self.phase_label = ctk.CTkLabel(right_frame, text="", font=ctk.CTkFont(size=12))
+        self.phase_label.pack()
+
+        self.status_label = ctk.CTkLabel(right_frame, text="", text_color=("gray40", "gray60"), font=ctk.CTkFont(size=12))
+        self.status_label.pack(pady=5)
+
+    def setup_menu(self):
+        """设置菜单栏"""
+        self.root.option_add("*Font", "SimHei 20")  # 设置全局菜单字体
+        menubar = tk.Menu(self.root)
+        help_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="帮助", menu=help_menu)
+
+        help_menu.add_command(label="关于", command=self.show_about_dialog)
+        help_menu.add_command(label="置顶", command=self.toggle_top)
+        help_menu.add_command(label="清除缓存", command=self.clear_cache)
+        help_menu.add_command(label="打开性能日志目录", command=self.open_log_directory)
+
+        self.root.config(menu=menubar)
+
+    def toggle_top(self):
+        """切换窗口置顶状态"""
+        if self.is_on_top:
+            self.root.attributes("-topmost", False)
+            self.is_on_top = False
+        else:
+            self.root.attributes("-topmost", True)
+            self.is_on_top = True
+
+    def clear_cache(self):
+        """清除内存和磁盘中的数据缓存"""
+        dataset_cache.clear()
+        columnar_cache.clear()
+        messagebox.showinfo("信息", "缓存已清除")
+
+    def open_log_directory(self):
+        """在文件管理器中打开性能日志目录"""
+        os.makedirs(LOG_DIRECTORY, exist_ok=True)
+        try:
+            if sys.platform == "win32":
+                os.startfile(LOG_DIRECTORY)
+            else:
+                subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", LOG_DIRECTORY])
+        except OSError:
+            messagebox.showinfo("信息", f"性能日志保存在 {LOG_DIRECTORY}")
+
+    def show_about_dialog(self):
+        """显示关于对话框"""
+        about_message = """\
+        考试成绩分析工具
+        版本：1.4.1
+        作者: fengyec2
+        许可证：GPL-3.0 license
+        项目地址：github.com/fengyec2/ExamAnalysisTool
+        """
+        messagebox.showinfo("关于", about_message)
+
+    def load_input_files(self):
+        """文件选择并更新列表"""
+        filepaths = filedialog.askopenfilenames(filetypes=[("Excel files", "*.xlsx")])
+        self._add_files(filepaths)
+
+    def _add_files(self, filepaths):
+        """统一添加文件方法，添加后自动预检"""
+        added = False
+        for fp in filepaths:
+            if fp not in self.file_handler.filepaths:
+                self.file_handler.filepaths.append(fp)
+                card = FileCard(
+                    self.file_scrollframe, 
+                    fp, 
+                    remove_callback=self._remove_file
+                )
+                card.pack(fill="x", pady=2)
+                self.file_cards[fp] = card
+                added = True
+        if added:
+            self.start_preflight()
+
+    def _remove_file(self, filepath):
+        """删除文件回调，重复的考试编号可能因此消除，需要重新预检"""
+        if filepath in self.file_handler.filepaths:
+            self.file_handler.filepaths.remove(filepath)
+        self.file_cards.pop(filepath, None)
+        dataset_cache.evict(filepath)
+        self.start_preflight()
+
+    def start_preflight(self):
+        """文件列表变化后在后台预检所有文件，开始新的预检时取消上一次"""
+        if self.preflight_token is not None:
+            self.preflight_token.cancel()
+        token = self.preflight_token = CancelToken()
+        self.preflight_results = {}
+        self.cancel_preview_load()
+        filepaths = list(self.file_handler.filepaths)
+        if self.preview_window is not None:
+            self.preview_window.set_loading("正在校验文件…" if filepaths else "请先选择成绩文件")
+        for fp in filepaths:
+            self.file_cards[fp].set_status("校验中…")
+        if filepaths:
+            threading.Thread(target=self._run_preflight, args=(filepaths, token), daemon=True).start()
+
+    def _run_preflight(self, filepaths, token):
+        """在后台线程中预检，结果交给界面线程处理"""
+        results = DataProcessor.preflight(filepaths, is_canceled_callback=token)
+        if results is not None:
+            self.queue.put(("preflight", (token, results)))
+
+    def apply_preflight(self, token, results):
+        """显示预检结果，返回需要写入日志的问题；已被新的预检取代的结果忽略"""
+        if token is not self.preflight_token or token():
+            return []
+        problems = []
+        for result in results:
+            self.preflight_results[result.file] = result
+            card = self.file_cards.get(result.file)
+            if card is None:
+                continue
+            if result.ok:
+                exam_numbers = "、".join(map(str, result.exam_numbers))
+                card.set_status(f"✓ 考试编号 {exam_numbers}", "ok")
+            else:
+                card.set_status("✗ " + "；".join(result.problems), "error")
+            problems.extend(("warning", message) for message in result.messages())
+        if self.preview_window is not None:
+            if problems:
+                self.preview_window.set_loading("有文件未通过校验")
+            else:
+                self.load_preview()
+        return problems
+
+    def check_files(self):
+        """提交任务前检查预检结果：没有文件、仍在校验或有文件不合格时给出提示并返回 False"""
+        filepaths = self.file_handler.filepaths
+        if not filepaths:
+            messagebox.showwarning("警告", "请先选择成绩文件")
+            return False
+        if any(fp not in self.preflight_results for fp in filepaths):
+            messagebox.showinfo("信息", "正在校验文件，请稍后再试")
+            return False
+        problems = [message for fp in filepaths for message in self.preflight_results[fp].messages()]
+        if problems:
+            messagebox.showerror("错误", "以下文件未通过校验，请修正或移除后再试：\n"
+                                 + self.summarize_messages(problems))
+            return False
+        return True
+
+    def start_calculate_progress(self):
+        """提交生成进退步系数报表的任务"""
+        if not self.check_files():
+            return
+        save_directory = filedialog.askdirectory(title="选择保存目录")
+        if not save_directory:
+            return
+
+        self.submit_job("进退步系数报表", ProgressCalculator.calculate_progress, save_directory,
+                        streaming=self.streaming_variable.get(), incremental=self.incremental_variable.get())
+
+    def start_generate_ranking_charts(self):
+        """提交生成年级排名折线图的任务"""
+        if not self.check_files():
+            return
+        save_directory = filedialog.askdirectory(title="选择 PDF/PNG 保存目录")
+        if not save_directory:
+            return
+
+        workers = (os.cpu_count() or 1) if self.parallel_variable.get() else 1
+        output_mode = dict(self.CHART_OUTPUT_MODES)[self.chart_output_variable.get()]
+        dpi = CHART_PREVIEW_DPI if self.preview_variable.get() else CHART_DPI
+        self.submit_job("年级排名折线图", RankingChartGenerator.generate_ranking_charts, save_directory,
+                        file_format=self.file_format_variable.get(), workers=workers, output_mode=output_mode,
+                        dpi=dpi, incremental=self.incremental_variable.get())
+
+    def start_generate_report(self):
+        """提交生成历次考试成绩单的任务"""
+        if not self.check_files():
+            return
+        save_directory = filedialog.askdirectory(title="选择 Excel 保存目录")
+        if not save_directory:
+            return
+
+        output_mode = dict(self.REPORT_OUTPUT_MODES)[self.report_output_variable.get()]
+        workers = (os.cpu_count() or 1) if self.parallel_variable.get() else 1
+        self.submit_job("历次考试成绩单", HistoricalReportGenerator.generate_report, save_directory,
+                        streaming=self.streaming_variable.get(), output_mode=output_mode, workers=workers,
+                        incremental=self.incremental_variable.get())
+
+    def open_student_preview(self):
+        """打开学生预览窗口，已打开时切换到前台"""
+        if self.preview_window is not None:
+            self.preview_window.focus()
+            return
+        if not self.check_files():
+            return
+        self.preview_window = StudentPreviewWindow(self.root, close_callback=self._on_preview_closed)
+        self.load_preview()
+
+    def _on_preview_closed(self):
+        self.cancel_preview_load()
+        self.preview_window = None
+
+    def cancel_preview_load(self):
+        if self.preview_token is not None:
+            self.preview_token.cancel()
+            self.preview_token = None
+
+    def load_preview(self):
+        """在后台线程读取并合并预览数据，已读取过的文件直接使用缓存"""
+        self.cancel_preview_load()
+        token = self.preview_token = CancelToken()
+        self.preview_window.set_loading()
+        threading.Thread(target=self._run_load_preview, args=(list(self.file_handler.filepaths), token),
+                         daemon=True).start()
+
+    def _run_load_preview(self, filepaths, token):
+        """在后台线程中构建学生索引，结果交给界面线程处理"""
+        history = RankingChartGenerator.load_history(filepaths, token, self.queue)
+        if not token():
+            store = history.store if history is not None and not history.empty else None
+            self.queue.put(("preview", (token, store)))
+
+    def apply_preview(self, token, store):
+        """把加载好的数据交给预览窗口；窗口已关闭或已开始新的加载时忽略"""
+        if token is not self.preview_token or token() or self.preview_window is None:
+            return
+        self.preview_token = None
+        if store is None:
+            self.preview_window.set_loading("没有有效的数据")
+        else:
+            self.preview_window.set_store(store)
+
+    def submit_job(self, name, func, save_directory, **kwargs):
+        """提交任务并加入任务列表，任务使用提交时的文件列表，之后修改列表不影响已提交的任务"""
+        job = self.scheduler.submit(name, func, list(self.file_handler.filepaths), save_directory,
+                                    profile=self.profile_variable.get(), **kwargs)
+        card = JobCard(self.job_scrollframe, job)
+        card.pack(fill="x", pady=2)
+        self.job_cards[job.id] = card
+        self.cancel_button.configure(state="normal")
+
+    def cancel_operation(self):
+        """取消所有等待中和运行中的任务"""
+        self.scheduler.cancel_all()
+
+    def process_queue(self):
+        """
+        信息处理：每次取出界面和所有任务待处理的消息，进度和阶段只使用最新值，所有消息批量写入日志面板，
+        信息和错误各合并为一个对话框；结束的任务从任务列表中移除
+        """
+        _, _, ui_messages = self.queue.drain()
+        messages = []
+        for msg_type, msg_content in ui_messages:
+            if msg_type == "preflight":
+                messages.extend(self.apply_preflight(*msg_content))
+            elif msg_type == "preview":
+                self.apply_preview(*msg_content)
+            elif msg_type not in ("timing", "stats"):
+                messages.append((msg_type, msg_content))
+        running_progress = []
+        pending_count = 0
+        for job in self.scheduler.jobs():
+            # 先读取状态再取消息，保证任务结束前发出的消息都已取出
+            done = job.done
+            progress, status, job_messages = job.queue.drain()
+            messages.extend((msg_type, f"{job.name}：{msg_content}") for msg_type, msg_content in job_messages
+                            if msg_type not in ("timing", "stats"))
+            card = self.job_cards.get(job.id)
+            if card is not None:
+                card.update_job(progress, status)
+            if done:
+                messages.append(("log", f"{job.name}{job.state}"))
+                self.scheduler.remove(job)
+                if card is not None:
+                    card.destroy()
+                    del self.job_cards[job.id]
+            elif job.state == Job.RUNNING:
+                running_progress.append(card.progress if card is not None else 0.0)
+            else:
+                pending_count += 1
+
+        # 总进度为运行中任务的平均进度
+        if running_progress:
+            self.progress_bar.set(sum(running_progress) / len(running_progress))
+            self.phase_label.configure(text=f"运行中 {len(running_progress)} 个任务，等待中 {pending_count} 个")
+        else:
+            self.phase_label.configure(text=f"等待中 {pending_count} 个任务" if pending_count else "")
+        self.cancel_button.configure(state="normal" if self.job_cards else "disabled")
+
+        dialogs = {"error": [], "info": []}
+        for msg_type, msg_content in messages:
+            if msg_type == "log":
+                self.status_label.configure(text=msg_content)
+            elif msg_type in dialogs:
+                dialogs[msg_type].append(msg_content)
+        warnings = sum(1 for msg_type, _ in messages if msg_type == "warning")
+        if warnings:
+            self.status_label.configure(text=f"出现 {warnings} 条警告，详见日志")
+        if messages:
+            self.append_log(messages)
+
+        if dialogs["error"]:
+            messagebox.showerror("错误", self.summarize_messages(dialogs["error"]))
+        if dialogs["info"]:
+            messagebox.showinfo("信息", self.summarize_messages(dialogs["info"]))
+        self.timer = self.root.after(100, self.process_queue)
+
+    def append_log(self, messages):
+        """将一批消息一次性写入日志面板，只保留最近的 LOG_MAX_LINES 行"""
+        timestamp = time.strftime("%H:%M:%S")
+        text = "".join(f"{timestamp} [{MESSAGE_LABELS.get(msg_type, msg_type)}] {msg_content}\n"
+                       for msg_type, msg_content in messages)
+        self.log_textbox.configure(state="normal")
+        self.log_textbox.insert("end", text)
+        line_count = int(self.log_textbox.index("end-1c").split(".")[0])
+        if line_count > self.LOG_MAX_LINES:
+            self.log_textbox.delete("1.0", f"{line_count - self.LOG_MAX_LINES}.0")
+        self.log_textbox.see("end")
+        self.log_textbox.configure(state="disabled")
+
+    @staticmethod
+    def summarize_messages(contents, limit=10):
+        """合并多条消息，过多时只显示前几条"""
+        if len(contents) <= limit:
+            return "\n".join(contents)
+        return "\n".join(contents[:limit]) + f"\n……等共 {len(contents)} 条，详见日志"
+
+    def run(self):
+        """运行应用，关闭窗口时取消所有任务"""
+        try:
+            self.root.mainloop()
+        finally:
+            self.scheduler.shutdown()
@@ -0,0 +1,51 @@
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+import ExamAnalysisTool
+from ExamAnalysisTool import DataProcessor, OperationCanceled, _init_reader, _preflight_workbook
+
+ROWS = 2000
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    """按大文件处理的工作簿：每 100 行检查一次是否取消"""
+    monkeypatch.setattr(ExamAnalysisTool, "LARGE_WORKBOOK_SIZE", 0)
+    monkeypatch.setattr(ExamAnalysisTool, "READ_CHUNK_ROWS", 100)
+    path = tmp_path / "1.xlsx"
+    pd.DataFrame({"考试编号": [1] * ROWS, "姓名": [f"同学{i}" for i in range(ROWS)],
+                  "级名": range(1, ROWS + 1)}).to_excel(path, index=False)
+    yield str(path)
+    ExamAnalysisTool.dataset_cache.clear()
+
+
+def test_canceled_preflight_stops_reading(workbook):
+    calls = 0
+
+    def is_canceled():
+        # 开始读取后第一次检查时取消
+        nonlocal calls
+        calls += 1
+        return calls > 1
+
+    assert DataProcessor.preflight([workbook], is_canceled_callback=is_canceled, max_workers=1) is None
+    assert calls == 2
+
+
+def test_preflight_worker_checks_cancel_event(workbook):
+    cancel_event = multiprocessing.Event()
+    cancel_event.set()
+    _init_reader(cancel_event)
+    try:
+        with pytest.raises(OperationCanceled):
+            _preflight_workbook(workbook, ExamAnalysisTool.REQUIRED_COLUMNS, ExamAnalysisTool.PREFLIGHT_COLUMNS)
+    finally:
+        _init_reader(None)
+
+
+def test_preflight_reads_exam_numbers(workbook):
+    results = DataProcessor.preflight([workbook], max_workers=1)
+    assert results[0].ok
+    assert results[0].exam_numbers == [1]
@@ -0,0 +1,34 @@
+import pickle
+import queue
+
+import pandas as pd
+
+from ExamAnalysisTool import ExamHistory, _plain_rows
+
+
+def build_history(students, exams=3):
+    frames = [pd.DataFrame({"考试编号": [exam] * students,
+                            "姓名": [f"同学{i}" for i in range(students)],
+                            "级名": list(range(1, students + 1)),
+                            "语文": [100] * students})
+              for exam in range(1, exams + 1)]
+    return ExamHistory.build(frames, queue.Queue())
+
+
+def task_size(students):
+    """与 generate_report 交给进程池的单个任务相同的数据"""
+    _, student_data = next(build_history(students).iter_students())
+    return len(pickle.dumps((_plain_rows(student_data), "out.xlsx")))
+
+
+def test_report_task_size_does_not_grow_with_student_count():
+    small = task_size(50)
+    large = task_size(5000)
+    assert large < small * 1.2
+
+
+def test_plain_rows_keeps_values():
+    _, student_data = next(build_history(10).iter_students())
+    plain = _plain_rows(student_data)
+    assert plain["姓名"].dtype == object
+    assert plain.astype(str).equals(student_data.astype(str))
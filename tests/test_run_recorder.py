@@ -0,0 +1,54 @@
+import glob
+import json
+import queue
+
+import ExamAnalysisTool
+from ExamAnalysisTool import RunRecorder
+
+RECORD_KEYS = {
+    "name", "started", "seconds", "stages", "rows", "students", "rows_per_second", "students_per_second",
+    "peak_memory", "children_peak_memory", "lifetime_peak_memory", "errors", "warnings", "profile_file",
+    "profile_top", "environment",
+}
+
+
+def run_job(tmp_path):
+    def job(recorder):
+        recorder.put(("stats", {"rows": 10, "students": 2}))
+        recorder.put(("timing", {"phase": "read", "seconds": 0.01, "items": 1}))
+
+    messages = queue.Queue()
+    recorder = RunRecorder("progress", messages)
+    recorder.log_directory = str(tmp_path)
+    recorder.run(job, recorder)
+    [log_file] = glob.glob(str(tmp_path / "*.json"))
+    with open(log_file, encoding="utf-8") as f:
+        return json.load(f), list(messages.queue)
+
+
+def test_log_shape_without_psutil(tmp_path, monkeypatch):
+    optional_module = ExamAnalysisTool._optional_module
+    monkeypatch.setattr(ExamAnalysisTool, "_optional_module",
+                        lambda name: None if name == "psutil" else optional_module(name))
+    record, messages = run_job(tmp_path)
+
+    assert set(record) == RECORD_KEYS
+    assert record["rows"] == 10 and record["students"] == 2
+    assert [stage["phase"] for stage in record["stages"]] == ["read"]
+    # 没有子进程时子进程峰值为 null，其余内存字段为整数或 null
+    assert record["children_peak_memory"] is None
+    for key in ("peak_memory", "lifetime_peak_memory"):
+        assert record[key] is None or isinstance(record[key], int)
+    assert messages[-1][0] == "log" and messages[-1][1].startswith("性能：")
+
+
+def test_log_shape_without_any_memory_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(ExamAnalysisTool, "_optional_module", lambda name: None)
+    monkeypatch.setattr(ExamAnalysisTool, "process_memory", lambda: (None, None))
+    record, messages = run_job(tmp_path)
+
+    assert set(record) == RECORD_KEYS
+    assert record["peak_memory"] is None
+    assert record["children_peak_memory"] is None
+    assert record["lifetime_peak_memory"] is None
+    assert "峰值内存" not in messages[-1][1]